@@ -0,0 +1,65 @@
+# Shared helpers of the benchmark scripts.
+
+# Imports
+import sys, os, time, json, gettext, platform, resource, statistics, importlib.util
+
+# Variables
+repo_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+source_dir = os.path.join(repo_dir, 'src')
+default_pkgdatadir = os.path.expanduser('~/.local/share/bmi')
+
+# Makes the `bmi` package importable.
+# With a pkgdatadir (an installed build) every module is available, with the
+# source tree only the modules at the top of src/ that do not need GTK.
+def load_package(pkgdatadir: str or None = None):
+  if 'bmi' in sys.modules:
+    return sys.modules['bmi']
+  gettext.install('bmi')
+  if pkgdatadir is not None:
+    sys.path.insert(1, pkgdatadir)
+    return importlib.import_module('bmi')
+  spec = importlib.util.spec_from_file_location(
+    'bmi', os.path.join(source_dir, '__init__.py'),
+    submodule_search_locations=[source_dir],
+  )
+  package = importlib.util.module_from_spec(spec)
+  sys.modules['bmi'] = package
+  spec.loader.exec_module(package)
+  return package
+
+# Calls a function `repeat` times and returns its timings in milliseconds.
+def measure(function, repeat: int = 20, number: int = 1) -> dict:
+  timings = []
+  for i in range(repeat):
+    start = time.perf_counter()
+    for j in range(number):
+      function()
+    timings.append((time.perf_counter() - start) * 1000 / number)
+  return summarize(timings)
+
+def summarize(timings: list) -> dict:
+  return {
+    'median_ms': statistics.median(timings),
+    'min_ms': min(timings),
+    'max_ms': max(timings),
+    'n': len(timings),
+  }
+
+def get_peak_rss_kb() -> int:
+  return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+def write_results(tier: str, results: dict, output: str or None):
+  document = {
+    'tier': tier,
+    'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+    'python': platform.python_version(),
+    'machine': platform.machine(),
+    'results': results,
+    'peak_rss_kb': get_peak_rss_kb(),
+  }
+  text = json.dumps(document, indent=2)
+  if output is None or output == '-':
+    print(text)
+  else:
+    with open(output, 'w') as file:
+      file.write(text + '\n')
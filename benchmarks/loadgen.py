@@ -0,0 +1,152 @@
+#! /usr/bin/env python3
+# Load generator for the scoring service.
+# Sends Score requests at increasing concurrency and reports throughput and
+# latency percentiles per level. Inputs are replayed from a recorded CSV or
+# JSONL file, or drawn around the defaults of the settings schema.
+#   bmi --service &
+#   ./benchmarks/loadgen.py -c 1,8,64 -o load.json
+#   ./benchmarks/loadgen.py --local       # in-process, no service needed
+#   ./benchmarks/loadgen.py --stand-in    # in-process socket server
+
+# Imports
+import os, csv, json, time, random, asyncio, argparse, tempfile
+import xml.etree.ElementTree as ElementTree
+
+# Internal imports
+import common
+
+# Variables
+schema_file = os.path.join(common.repo_dir, 'data', 'io.github.philippkosarev.bmi.gschema.xml')
+# Input bounds of the window's rows
+bounds = {
+  'height': (10, 999),
+  'mass': (10, 999),
+  'waist': (10, 999),
+  'hip': (10, 999),
+  'age': (18, 150),
+}
+# Relative spread of the drawn inputs around their defaults
+spreads = {
+  'height': 0.06,
+  'mass': 0.25,
+  'waist': 0.18,
+  'hip': 0.1,
+  'age': 0.5,
+}
+
+# Helper functions
+def get_schema_defaults() -> dict:
+  root = ElementTree.parse(schema_file).getroot()
+  defaults = {}
+  for key in root.iter('key'):
+    name = key.get('name')
+    if name in bounds:
+      defaults[name] = float(key.find('default').text)
+  return defaults
+
+# Returns a function that returns a random inputs dict.
+def synthetic_inputs(seed: int):
+  generator = random.Random(seed)
+  defaults = get_schema_defaults()
+  def draw() -> dict:
+    inputs = {}
+    for key, default in defaults.items():
+      lower, upper = bounds.get(key)
+      value = generator.gauss(default, default * spreads.get(key))
+      inputs[key] = min(max(value, lower), upper)
+    inputs['age'] = round(inputs.get('age'))
+    inputs['gender'] = generator.randint(0, 2)
+    return inputs
+  return draw
+
+def replayed_inputs(path: str, seed: int):
+  from bmi import scorer
+  with open(path, newline='') as file:
+    if path.endswith(('.jsonl', '.ndjson')):
+      rows = [json.loads(line) for line in file if line.strip()]
+    else:
+      rows = list(csv.DictReader(file))
+  rows = [scorer.parse_row(row) for row in rows]
+  generator = random.Random(seed)
+  return lambda: generator.choice(rows)
+
+# In-process stand-in for the service's socket, built on the calculator.
+async def serve_stand_in(path: str):
+  from bmi import scorer
+  async def handle(reader, writer):
+    while line := await reader.readline():
+      request = json.loads(line)
+      params = request.get('params')
+      rows = [params] if request.get('method') == 'Score' else params
+      try:
+        results = scorer.score_rows([scorer.parse_row(row) for row in rows])
+        result = results[0] if request.get('method') == 'Score' else results
+        reply = {'id': request.get('id'), 'result': result}
+      except ValueError as e:
+        reply = {'id': request.get('id'), 'error': str(e)}
+      writer.write((json.dumps(reply) + '\n').encode())
+    writer.close()
+  return await asyncio.start_unix_server(handle, path)
+
+# Load generation
+async def run_level(client, draw, concurrency: int, n_requests: int) -> dict:
+  from bmi.histogram import Histogram
+  histogram = Histogram()
+  remaining = n_requests
+  async def worker():
+    nonlocal remaining
+    while remaining > 0:
+      remaining -= 1
+      start = time.perf_counter()
+      await client.score(draw())
+      histogram.record(time.perf_counter() - start)
+  start = time.perf_counter()
+  await asyncio.gather(*[worker() for i in range(concurrency)])
+  elapsed = time.perf_counter() - start
+  return histogram.to_dict() | {
+    'concurrency': concurrency,
+    'throughput_rps': n_requests / elapsed,
+  }
+
+async def run(args) -> dict:
+  common.load_package()
+  from bmi.client import ScoringClient, LocalScorer
+  if args.replay:
+    draw = replayed_inputs(args.replay, args.seed)
+  else:
+    draw = synthetic_inputs(args.seed)
+  server = None
+  socket_path = args.socket
+  if args.stand_in:
+    socket_path = os.path.join(tempfile.mkdtemp(), 'scorer.sock')
+    server = await serve_stand_in(socket_path)
+  results = {}
+  for concurrency in args.concurrency:
+    if args.local:
+      client = LocalScorer()
+    else:
+      client = ScoringClient(socket_path, timeout=args.timeout)
+    async with client:
+      result = await run_level(client, draw, concurrency, args.requests)
+    results[f'score.concurrency_{concurrency}'] = result
+  if server is not None:
+    server.close()
+    await server.wait_closed()
+  return results
+
+# Entry point
+if __name__ == '__main__':
+  parser = argparse.ArgumentParser(description='Scoring service load generator')
+  parser.add_argument('-c', '--concurrency', default='1,4,16,64',
+    type=lambda text: [int(level) for level in text.split(',')])
+  parser.add_argument('-n', '--requests', type=int, default=5000, help='requests per level')
+  parser.add_argument('--replay', help='CSV or JSONL file of recorded inputs')
+  parser.add_argument('--socket', help='socket path of the service')
+  parser.add_argument('--timeout', type=float, default=5.0)
+  parser.add_argument('--seed', type=int, default=0)
+  mode = parser.add_mutually_exclusive_group()
+  mode.add_argument('--local', action='store_true', help='score in-process without a socket')
+  mode.add_argument('--stand-in', action='store_true', help='serve an in-process stand-in socket')
+  parser.add_argument('-o', '--output', help='JSON output file, stdout if omitted')
+  args = parser.parse_args()
+  common.write_results('load', asyncio.run(run(args)), args.output)
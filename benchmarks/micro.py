@@ -0,0 +1,83 @@
+#! /usr/bin/env python3
+# Pure-Python micro-benchmarks of the calculator and the threshold logic.
+# Runs from the source tree and needs no display:
+#   ./benchmarks/micro.py -o micro.json
+
+# Imports
+import sys, io, math, random, argparse
+
+# Internal imports
+import common
+
+# Helper functions
+def random_inputs(n: int, seed: int = 0) -> list:
+  generator = random.Random(seed)
+  return [
+    {
+      'height': generator.uniform(140, 210),
+      'mass': generator.uniform(40, 150),
+      'waist': generator.uniform(55, 140),
+      'hip': generator.uniform(75, 140),
+      'age': generator.randint(18, 90),
+      'gender': generator.randint(0, 2),
+    }
+    for i in range(n)
+  ]
+
+def to_columns(rows: list) -> dict:
+  return {key: [row[key] for row in rows] for key in rows[0]}
+
+def to_csv(rows: list) -> str:
+  keys = list(rows[0])
+  lines = [','.join(keys)]
+  lines += [','.join(str(row[key]) for key in keys) for row in rows]
+  return '\n'.join(lines) + '\n'
+
+# Benchmarks
+def run(n_rows: int, repeat: int) -> dict:
+  bmi = common.load_package()
+  from bmi import metrics, scorer
+  calc = metrics.calc
+  rows = random_inputs(n_rows)
+  columns = to_columns(rows)
+  inputs = rows[0]
+  results = {}
+
+  def scalar_all():
+    for row in rows:
+      calc.bmi(row); calc.whtr(row); calc.whr(row); calc.bri(row)
+  results['calculator.scalar_rows'] = common.measure(scalar_all, repeat)
+
+  results['calculator.batch_rows'] = common.measure(lambda: calc.batch(columns), repeat)
+
+  def classify_all():
+    for metric in metrics.registry.values():
+      metric.table.classify(metric.function(inputs), inputs)
+  results['thresholds.classify_4_metrics'] = common.measure(classify_all, repeat, 1000)
+
+  csv_text = to_csv(rows)
+  def score_csv():
+    scorer.score_csv(io.StringIO(csv_text), io.StringIO())
+  results['scorer.csv_rows'] = common.measure(score_csv, repeat)
+
+  # A year of hourly results, drawn 400 pixels wide at a tenth of it
+  from bmi.downsample import DownsampledLine
+  times = [i * 3600.0 for i in range(24 * 365)]
+  line = DownsampledLine(times, [25 + math.sin(i / 500) for i in range(len(times))])
+  results['downsample.trend_frame'] = common.measure(
+    lambda: line.get_range(times[4000], times[4876], 400), repeat, 100,
+  )
+
+  for key in results:
+    if key.endswith('_rows'):
+      results[key]['rows'] = n_rows
+  return results
+
+# Entry point
+if __name__ == '__main__':
+  parser = argparse.ArgumentParser(description='Calculator micro-benchmarks')
+  parser.add_argument('-n', '--rows', type=int, default=10_000)
+  parser.add_argument('-r', '--repeat', type=int, default=10)
+  parser.add_argument('-o', '--output', help='JSON output file, stdout if omitted')
+  args = parser.parse_args()
+  common.write_results('micro', run(args.rows, args.repeat), args.output)
@@ -0,0 +1,171 @@
+#! /usr/bin/env python3
+# Startup and interaction benchmarks of an installed build.
+# Needs a display, which can be a headless stand-in:
+#   xvfb-run -a ./benchmarks/ui.py -o ui.json
+#   gtk4-broadwayd :5 & GDK_BACKEND=broadway BROADWAY_DISPLAY=:5 ./benchmarks/ui.py
+# Settings are kept in memory, and history and profiles in a temporary
+# directory, so the user's stored inputs are not touched.
+
+# Imports
+import sys, os, json, argparse, tempfile, subprocess
+
+# Internal imports
+import common
+
+# Helper functions
+def load_app(pkgdatadir: str):
+  os.environ.setdefault('GSETTINGS_BACKEND', 'memory')
+  os.environ['XDG_DATA_HOME'] = tempfile.mkdtemp(prefix='bmi-benchmark-')
+  common.load_package(pkgdatadir)
+  from bmi import startup
+  import gi
+  gi.require_version('Gtk', '4.0')
+  gi.require_version('Adw', '1')
+  from gi.repository import Gio
+  resource = Gio.Resource.load(os.path.join(pkgdatadir, 'bmi.gresource'))
+  resource._register()
+  startup.mark('resource load')
+  from bmi import main
+  startup.mark('import')
+  app = main.BmiApplication('benchmark')
+  app.set_flags(app.get_flags() | Gio.ApplicationFlags.NON_UNIQUE)
+  return app
+
+# Stores `n` profiles with cached results, named 'profile 0' and so on.
+def create_profiles(n: int):
+  from bmi import metrics
+  from bmi.profiles import ProfileStore
+  store = ProfileStore()
+  for i in range(n):
+    inputs = {
+      'height': 150 + i % 50, 'mass': 50 + i % 70, 'waist': 70 + i % 40,
+      'hip': 90 + i % 30, 'age': 20 + i % 60, 'gender': i % 3,
+    }
+    results = {}
+    for metric in metrics.registry.values():
+      result = metric.function(inputs)
+      results[metric.name] = (result, *metric.table.classify(result, inputs))
+    store.add(f'profile {i}', inputs, results)
+  store.save()
+
+# Returns a value next to the input row's own and within its range: one
+# step up, or one step down at the upper bound.
+def get_other_value(row):
+  value = row.get_value()
+  if hasattr(row, 'adjustment'):
+    adjustment = row.adjustment
+    step = adjustment.get_step_increment() or 1
+    upper = adjustment.get_upper() - adjustment.get_page_size()
+    return value + step if value + step <= upper else value - step
+  # Drop-down rows select an item of their model
+  return value + 1 if value + 1 < row.get_model().get_n_items() else value - 1
+
+# Runs pending main loop work, so that deferred updates are included.
+def drain():
+  from gi.repository import GLib
+  context = GLib.MainContext.default()
+  while context.pending():
+    context.iteration(False)
+
+# Runs `function` once the window has painted its first frame, then quits.
+def run_after_first_frame(app, function):
+  from gi.repository import GLib
+  def on_after_paint(frame_clock):
+    frame_clock.disconnect(handler_ids.pop())
+    GLib.idle_add(lambda: function() or app.quit())
+  def on_activate(app):
+    frame_clock = app.win.get_frame_clock()
+    handler_ids.append(frame_clock.connect('after-paint', on_after_paint))
+  handler_ids = []
+  app.connect_after('activate', on_activate)
+  app.run([])
+
+# Benchmarks
+
+# Started in a fresh process per run by cold_start().
+def cold_start_child(pkgdatadir: str):
+  common.load_package(pkgdatadir)
+  from bmi import startup
+  startup.enable()
+  app = load_app(pkgdatadir)
+  run_after_first_frame(app, lambda: None)
+  # Times of the marks are measured from process start
+  print(json.dumps({
+    'total_ms': startup.marks[-1][1] * 1000,
+    'stages': startup.marks,
+  }))
+
+def cold_start(pkgdatadir: str, repeat: int) -> dict:
+  timings = []
+  for i in range(repeat):
+    process = subprocess.run(
+      [sys.executable, __file__, '--pkgdatadir', pkgdatadir, '--cold-start-child'],
+      stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, check=True,
+    )
+    timings.append(json.loads(process.stdout.splitlines()[-1]).get('total_ms'))
+  return common.summarize(timings)
+
+def interaction(pkgdatadir: str, repeat: int, n_profiles: int) -> dict:
+  app = load_app(pkgdatadir)
+  create_profiles(n_profiles)
+  results = {}
+
+  def run():
+    win = app.win
+    win.get_app().get_settings()['advanced-mode'] = True
+    drain()
+    # Input changes
+    for row in win.input_rows:
+      values = iter([get_other_value(row), row.get_value()] * repeat)
+      def change_input():
+        row.set_value(next(values))
+        drain()
+      n_mutations = win.get_n_mutations()
+      result = common.measure(change_input, repeat)
+      # Widget changes of the result rows, fewer is less relayout
+      result['mutations_per_update'] = (win.get_n_mutations() - n_mutations) / repeat
+      results[f'update_results.{row.get_key()}'] = result
+    # Result dialogs
+    for row in win.result_rows:
+      def open_dialog():
+        win.on_result_row_info_clicked(row, row.info_button)
+        drain()
+        win.get_visible_dialog().force_close()
+      results[f'result_dialog.{row.get_title()}'] = common.measure(open_dialog, repeat)
+    # Preferences
+    def open_preferences():
+      app.show_preferences(None, None)
+      drain()
+      win.get_visible_dialog().force_close()
+    results['preferences'] = common.measure(open_preferences, repeat)
+    # Profiles, switched between two of many
+    names = iter(['profile 0', 'profile 1'] * repeat)
+    def switch_profile():
+      win.switch_profile(next(names))
+      drain()
+    n_mutations = win.get_n_mutations()
+    result = common.measure(switch_profile, repeat)
+    result['mutations_per_update'] = (win.get_n_mutations() - n_mutations) / repeat
+    results['switch_profile'] = result
+    results['search_profiles'] = common.measure(lambda: win.search_profiles('profile 1'), repeat)
+    results['search_profiles']['profiles'] = n_profiles
+    win.switch_profile('')
+
+  run_after_first_frame(app, run)
+  return results
+
+# Entry point
+if __name__ == '__main__':
+  parser = argparse.ArgumentParser(description='UI benchmarks of an installed build')
+  parser.add_argument('--pkgdatadir', default=common.default_pkgdatadir)
+  parser.add_argument('-r', '--repeat', type=int, default=10)
+  parser.add_argument('-p', '--profiles', type=int, default=5000, help='stored profiles')
+  parser.add_argument('-o', '--output', help='JSON output file, stdout if omitted')
+  parser.add_argument('--cold-start-child', action='store_true', help=argparse.SUPPRESS)
+  args = parser.parse_args()
+  if args.cold_start_child:
+    cold_start_child(args.pkgdatadir)
+    sys.exit(0)
+  results = {'cold_start': cold_start(args.pkgdatadir, args.repeat)}
+  results |= interaction(args.pkgdatadir, args.repeat, args.profiles)
+  common.write_results('ui', results, args.output)
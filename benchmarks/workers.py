@@ -0,0 +1,48 @@
+#! /usr/bin/env python3
+# Scaling benchmark of the batch scorer's --workers mode.
+# Scores the same generated CSV with an increasing number of workers, checks
+# that every output matches the single-process one, and reports speedups.
+#   ./benchmarks/workers.py -n 2000000 -w 1,2,4,8,16,32 -o workers.json
+
+# Imports
+import os, time, filecmp, argparse, tempfile
+
+# Internal imports
+import common
+from micro import random_inputs, to_csv
+
+# Benchmarks
+def run(n_rows: int, workers: list) -> dict:
+  common.load_package()
+  from bmi import scorer
+  results = {}
+  with tempfile.TemporaryDirectory(prefix='bmi-bench-') as temp_dir:
+    input_path = os.path.join(temp_dir, 'input.csv')
+    with open(input_path, 'w') as file:
+      file.write(to_csv(random_inputs(n_rows)))
+    reference_path = None
+    for n_workers in workers:
+      output_path = os.path.join(temp_dir, f'output-{n_workers}.csv')
+      start = time.perf_counter()
+      scorer.main([input_path, '-o', output_path, '--workers', str(n_workers)])
+      elapsed = time.perf_counter() - start
+      if reference_path is None:
+        reference_path = output_path
+        reference_time = elapsed
+      results[f'scorer.workers_{n_workers}'] = {
+        'seconds': elapsed,
+        'rows_per_second': n_rows / elapsed,
+        'speedup': reference_time / elapsed,
+        'matches_reference': filecmp.cmp(reference_path, output_path, shallow=False),
+      }
+  return results
+
+# Entry point
+if __name__ == '__main__':
+  parser = argparse.ArgumentParser(description='Batch scorer scaling benchmark')
+  parser.add_argument('-n', '--rows', type=int, default=500_000)
+  parser.add_argument('-w', '--workers', default=f'1,2,4,{os.cpu_count()}',
+    type=lambda text: sorted({int(n) for n in text.split(',')}))
+  parser.add_argument('-o', '--output', help='JSON output file, stdout if omitted')
+  args = parser.parse_args()
+  common.write_results('workers', run(args.rows, args.workers), args.output)
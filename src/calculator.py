@@ -1,71 +1,421 @@
 # Imports
-import math
+import sys, math, functools
+from array import array
+from enum import Enum
+from dataclasses import dataclass, fields
 
-# Internal imports
-from .widgets.shared import *
+# Optional imports
+# NumPy takes longer to import than the window takes to start, so it is only
+# imported where arrays are made, see get_numpy(), or already given.
+
+# Variables
+
+# Should always be in the same order as the StringList of gender_input_row.
+class Gender(Enum):
+  AVERAGE = 0
+  FEMALE = 1
+  MALE = 2
+
+# Inputs of the calculator, unset ones are None.
+@dataclass(slots=True)
+class Inputs:
+  height: float = None
+  mass: float = None
+  waist: float = None
+  hip: float = None
+  age: float = None
+  gender: int = None
+
+  @classmethod
+  def from_dict(cls, inputs: dict):
+    return cls(**{key: inputs[key] for key in input_keys if key in inputs})
+
+  # Returns the set inputs as a dict.
+  def to_dict(self) -> dict:
+    return dict(self.items())
+
+  # Dict-style access, for code written for inputs dicts
+  def get(self, key: str, default = None):
+    if key not in input_keys:
+      return default
+    value = getattr(self, key)
+    return default if value is None else value
+
+  def __getitem__(self, key: str):
+    value = self.get(key)
+    if value is None:
+      raise KeyError(key)
+    return value
+
+  def items(self) -> list:
+    return [
+      (key, value) for key in input_keys
+      if (value := getattr(self, key)) is not None
+    ]
+
+input_keys = tuple(field.name for field in fields(Inputs))
+
+# Returns inputs as an Inputs record, converting dicts.
+def as_inputs(inputs) -> Inputs:
+  if type(inputs) is Inputs:
+    return inputs
+  return Inputs.from_dict(inputs)
+
+batch_metrics = ['bmi', 'whtr', 'whr', 'bri']
+batch_thresholds = ['whtr_unhealthy', 'whr_overweight', 'whr_obese']
+
+# Records which inputs a function reads, as its `inputs` attribute.
+def reads(*keys):
+  def decorator(function):
+    function.inputs = frozenset(keys)
+    return function
+  return decorator
+
+# Threshold functions
+# Thresholds only depend on age or gender, so they are plain functions of
+# those, cached, and tabulated for batch scoring.
+whr_overweight_by_gender = (0.85, 0.8, 0.9)
+whr_obese_by_gender = (0.925, 0.85, 1)
+max_age = 150
+
+@functools.lru_cache(maxsize=256)
+def whtr_unhealthy_for_age(age: float) -> float:
+  if age > 40: return ((age - 40) / 100) + 0.5
+  else:        return 0.5
+
+@functools.lru_cache(maxsize=len(Gender))
+def whr_overweight_for_gender(gender: int) -> float:
+  return whr_overweight_by_gender[Gender(gender).value]
+
+@functools.lru_cache(maxsize=len(Gender))
+def whr_obese_for_gender(gender: int) -> float:
+  return whr_obese_by_gender[Gender(gender).value]
+
+# Indexed by whole years of age
+whtr_unhealthy_by_age = tuple(whtr_unhealthy_for_age(age) for age in range(max_age + 1))
 
 # Class
 class Calculator:
 
   # Returns BMI
-  def bmi(self, inputs: dict):
-    mass = inputs.get('mass')
-    height = inputs.get('height')
-    result = mass / ((height / 100) ** 2)
+  @reads('height', 'mass')
+  def bmi(self, inputs: Inputs or dict):
+    inputs = as_inputs(inputs)
+    height = inputs.height / 100
+    # Not ** 2, which raises OverflowError for huge values instead of giving inf
+    result = inputs.mass / (height * height)
     return result
 
-  def bmi_and_height_to_weight(self, inputs: dict, bmi: float):
-    height = inputs.get('height')
-    mass = bmi * ((height / 100) ** 2)
+  @reads('height')
+  def bmi_and_height_to_weight(self, inputs: Inputs or dict, bmi: float):
+    height = as_inputs(inputs).height / 100
+    mass = bmi * (height * height)
     return mass
 
   # Returns Waist To Height Ratio
-  def whtr(self, inputs: dict) -> float:
-    waist = inputs.get('waist')
-    height = inputs.get('height')
-    return waist / height
+  @reads('height', 'waist')
+  def whtr(self, inputs: Inputs or dict) -> float:
+    inputs = as_inputs(inputs)
+    return inputs.waist / inputs.height
 
   # Returns health thresholds for WHTR
-  def whtr_unhealthy(self, inputs: dict):
-    age = inputs.get('age')
-    if   age > 40: return ((age - 40) / 100) + 0.5
-    elif age > 50: return 0.6
-    else:          return 0.5
+  @reads('age')
+  def whtr_unhealthy(self, inputs: Inputs or dict):
+    return whtr_unhealthy_for_age(as_inputs(inputs).age)
 
   # Returns Waist to Hip Ratio
-  def whr(self, inputs: dict) -> float:
-    result = inputs.get('waist') / inputs.get('hip')
+  @reads('waist', 'hip')
+  def whr(self, inputs: Inputs or dict) -> float:
+    inputs = as_inputs(inputs)
+    result = inputs.waist / inputs.hip
     return result
 
   # Returns overweight threshold for WHR
-  def whr_overweight(self, inputs: dict) -> float:
-    gender = Gender(inputs.get('gender'))
-    thresholds_by_gender = {
-      Gender.AVERAGE: 0.85,
-      Gender.FEMALE: 0.8,
-      Gender.MALE: 0.9,
-    }
-    result = thresholds_by_gender.get(gender)
-    return result
+  @reads('gender')
+  def whr_overweight(self, inputs: Inputs or dict) -> float:
+    return whr_overweight_for_gender(as_inputs(inputs).gender)
 
   # Returns obese threshold for WHR
-  def whr_obese(self, inputs: dict) -> float:
-    gender = Gender(inputs.get('gender'))
-    thresholds_by_gender = {
-      Gender.AVERAGE: 0.925,
-      Gender.FEMALE: 0.85,
-      Gender.MALE: 1,
-    }
-    result = thresholds_by_gender.get(gender)
-    return result
+  @reads('gender')
+  def whr_obese(self, inputs: Inputs or dict) -> float:
+    return whr_obese_for_gender(as_inputs(inputs).gender)
 
   # Returns Body Roundness Index
-  def bri(self, inputs: dict) -> float:
-    waist = inputs.get('waist')
-    height = inputs.get('height')
-    try:
-      bri = 364.2 - (365.5 * math.sqrt((1 - (waist / (math.pi * height)) ** 2)))
-    except (ZeroDivisionError, ValueError):
-      # Sometimes sqrt() errors out due to trying to sqrt a negative number
-      bri = None
-    return bri
+  @reads('height', 'waist')
+  def bri(self, inputs: Inputs or dict) -> float:
+    inputs = as_inputs(inputs)
+    bri = scalar_bri(inputs.waist, inputs.height)
+    return None if math.isnan(bri) else bri
+
+  # Scores whole columns of inputs in one pass.
+  # Takes a dict of equally long columns (NumPy arrays, array.array or any
+  # other sequence) keyed like the inputs dict, and returns a dict with a
+  # column for every metric in `batch_metrics` and threshold in
+  # `batch_thresholds` whose inputs were given. Rows for which the scalar
+  # function fails or returns None are NaN. Metrics in `skip` are left out.
+  def batch(self, columns: dict, skip = ()) -> dict:
+    if any(map(is_array, columns.values())):
+      return batch_numpy(columns, skip)
+    return batch_python(columns, skip)
+
+# Internal functions
+
+# Returns the NumPy module, or None if it is not installed.
+@functools.cache
+def get_numpy():
+  try:
+    import numpy
+  except ImportError:
+    return None
+  return numpy
+
+# Returns whether a column is a NumPy array, without importing NumPy, as
+# there are no arrays before it is imported.
+def is_array(column) -> bool:
+  numpy = sys.modules.get('numpy')
+  return numpy is not None and isinstance(column, numpy.ndarray)
+
+def check_genders(genders):
+  n_genders = len(Gender)
+  for gender in set(genders):
+    if not 0 <= gender < n_genders:
+      raise ValueError(f'{gender} is not a valid Gender')
+
+def safe_divide(a: float, b: float) -> float:
+  try:
+    return a / b
+  except ZeroDivisionError:
+    return math.nan
+
+# Returns Body Roundness Index, or NaN where it is undefined.
+def scalar_bri(waist: float, height: float) -> float:
+  try:
+    ratio = waist / (math.pi * height)
+    return 364.2 - (365.5 * math.sqrt(1 - ratio * ratio))
+  except (ZeroDivisionError, ValueError):
+    # Sometimes sqrt() errors out due to trying to sqrt a negative number
+    return math.nan
+
+# Looks ages up in whtr_unhealthy_by_age when they are all whole years in
+# its range, otherwise falls back to the cached function.
+def lookup_whtr_unhealthy(age) -> array:
+  if len(age) and 0 <= min(age) and max(age) <= max_age:
+    if all(map(float.is_integer, map(float, age))):
+      table = whtr_unhealthy_by_age
+      return array('d', [table[a] for a in map(int, age)])
+  return array('d', map(whtr_unhealthy_for_age, age))
+
+# Returns a column with unset (None) values as NaN, like NumPy reads them.
+def fill_missing(column):
+  if column is None or not isinstance(column, list) or None not in column:
+    return column
+  return [math.nan if value is None else value for value in column]
+
+def batch_python(columns: dict, skip = ()) -> dict:
+  height = fill_missing(columns.get('height'))
+  mass = fill_missing(columns.get('mass'))
+  waist = fill_missing(columns.get('waist'))
+  hip = fill_missing(columns.get('hip'))
+  age = fill_missing(columns.get('age'))
+  gender = columns.get('gender')
+  results = {}
+  if height is not None and mass is not None and 'bmi' not in skip:
+    results['bmi'] = array('d', [
+      safe_divide(m, (h / 100) * (h / 100)) for h, m in zip(height, mass)
+    ])
+  if height is not None and waist is not None:
+    if 'whtr' not in skip:
+      results['whtr'] = array('d', map(safe_divide, waist, height))
+    if 'bri' not in skip:
+      results['bri'] = array('d', map(scalar_bri, waist, height))
+  if waist is not None and hip is not None and 'whr' not in skip:
+    results['whr'] = array('d', map(safe_divide, waist, hip))
+  if age is not None:
+    results['whtr_unhealthy'] = lookup_whtr_unhealthy(age)
+  if gender is not None:
+    genders = [int(g) for g in gender]
+    check_genders(genders)
+    overweight = whr_overweight_by_gender
+    obese = whr_obese_by_gender
+    results['whr_overweight'] = array('d', [overweight[g] for g in genders])
+    results['whr_obese'] = array('d', [obese[g] for g in genders])
+  return results
+
+def batch_numpy(columns: dict, skip = ()) -> dict:
+  import numpy
+  as_array = lambda key: numpy.asarray(columns.get(key), dtype=numpy.float64)
+  has = lambda *keys: all(columns.get(key) is not None for key in keys)
+  # Division by zero gives inf here, but the scalar functions raise
+  divide = lambda a, b: numpy.where(b == 0, math.nan, a / b)
+  results = {}
+  with numpy.errstate(divide='ignore', invalid='ignore', over='ignore'):
+    if has('height', 'mass') and 'bmi' not in skip:
+      height = as_array('height')
+      results['bmi'] = divide(as_array('mass'), (height / 100) ** 2)
+    if has('height', 'waist'):
+      height = as_array('height')
+      waist = as_array('waist')
+      if 'whtr' not in skip:
+        results['whtr'] = divide(waist, height)
+      if 'bri' not in skip:
+        ratio = 1 - divide(waist, math.pi * height) ** 2
+        results['bri'] = 364.2 - (365.5 * numpy.sqrt(ratio))
+    if has('waist', 'hip') and 'whr' not in skip:
+      results['whr'] = divide(as_array('waist'), as_array('hip'))
+  if has('age'):
+    age = as_array('age')
+    whole = numpy.floor(age) == age
+    if age.size and whole.all() and 0 <= age.min() and age.max() <= max_age:
+      table = numpy.asarray(whtr_unhealthy_by_age, dtype=numpy.float64)
+      results['whtr_unhealthy'] = table[age.astype(numpy.intp)]
+    else:
+      results['whtr_unhealthy'] = numpy.where(age > 40, ((age - 40) / 100) + 0.5, 0.5)
+  if has('gender'):
+    genders = numpy.asarray(columns.get('gender'), dtype=numpy.intp)
+    check_genders(numpy.unique(genders).tolist())
+    results['whr_overweight'] = numpy.asarray(whr_overweight_by_gender, dtype=numpy.float64)[genders]
+    results['whr_obese'] = numpy.asarray(whr_obese_by_gender, dtype=numpy.float64)[genders]
+  return results
+
+# Lookup tables
+
+# Metrics of a height and a mass, and of a waist and a height.
+def pair_bmi(height: float, mass: float) -> float:
+  return safe_divide(mass, (height / 100) * (height / 100))
+
+pair_functions = {
+  'bmi': (('height', 'mass'), pair_bmi),
+  'whtr': (('waist', 'height'), safe_divide),
+  'bri': (('waist', 'height'), scalar_bri),
+}
+
+# Returns whether every value of a column is a whole number within `bounds`.
+def is_whole_in(column, bounds: range) -> bool:
+  if is_array(column):
+    import numpy
+    return bool(column.size and (numpy.floor(column) == column).all()
+      and bounds[0] <= column.min() and column.max() <= bounds[-1])
+  if not len(column) or min(column) < bounds[0] or max(column) > bounds[-1]:
+    return False
+  return all(map(float.is_integer, map(float, column)))
+
+# Results of a function of two inputs for every pair of whole numbers in two
+# ranges, along with the results rounded to `digits` like ResultRow shows
+# them. The table is filled on first use.
+class PairTable:
+
+  def __init__(self, function, first: range, second: range, digits: int):
+    self.function = function
+    self.first = first
+    self.second = second
+    self.digits = digits
+    self.values = None
+    self.rounded = None
+
+  def get_n_entries(self) -> int:
+    return len(self.first) * len(self.second)
+
+  def build(self):
+    values = array('d')
+    for first in self.first:
+      values.extend(map(self.function, [first] * len(self.second), self.second))
+    digits = self.digits
+    self.values = values
+    self.rounded = array('d', [round(value, digits) for value in values])
+
+  def is_built(self) -> bool:
+    return self.values is not None
+
+  # Returns the positions of the pairs of two columns in the table, or None
+  # if a pair is outside of it.
+  def get_indices(self, first_column, second_column):
+    if not is_whole_in(first_column, self.first):
+      return None
+    if not is_whole_in(second_column, self.second):
+      return None
+    width = len(self.second)
+    offset = self.first.start * width + self.second.start
+    if is_array(first_column) or is_array(second_column):
+      import numpy
+      indices = numpy.asarray(first_column).astype(numpy.intp) * width
+      indices += numpy.asarray(second_column).astype(numpy.intp) - offset
+      return indices
+    return [
+      first * width + second - offset
+      for first, second in zip(map(int, first_column), map(int, second_column))
+    ]
+
+  # Returns the results and rounded results at positions from get_indices().
+  def gather(self, indices) -> tuple:
+    if self.values is None:
+      self.build()
+    if is_array(indices):
+      import numpy
+      values = numpy.frombuffer(self.values, dtype=numpy.float64)[indices]
+      rounded = numpy.frombuffer(self.rounded, dtype=numpy.float64)[indices]
+      return values, rounded
+    values = self.values
+    rounded = self.rounded
+    return array('d', [values[i] for i in indices]), array('d', [rounded[i] for i in indices])
+
+# Table-driven alternative to Calculator.batch() for whole-number inputs.
+# BMI is tabulated per (height, mass) and WHtR and BRI per (waist, height),
+# the weights of `context_bmis` per height. Columns outside of the ranges, or
+# not whole, fall back to calculating. Tables are built on first use, and the
+# ranges may not add up to more than `max_entries` entries.
+class LookupTables:
+
+  def __init__(
+    self, digits: dict, context_bmis = (),
+    height = range(50, 251), mass = range(10, 301), waist = range(30, 201),
+    max_entries: int = 1 << 20,
+  ):
+    ranges = {'height': height, 'mass': mass, 'waist': waist}
+    self.calc = Calculator()
+    self.tables = {}
+    for metric, (keys, function) in pair_functions.items():
+      first, second = (ranges.get(key) for key in keys)
+      self.tables[metric] = (keys, PairTable(function, first, second, digits.get(metric)))
+    self.height = height
+    self.context_bmis = tuple(context_bmis)
+    self.weights = None
+    n_entries = sum(table.get_n_entries() for keys, table in self.tables.values())
+    n_entries += len(height) * len(self.context_bmis)
+    if n_entries > max_entries:
+      raise ValueError(f'Lookup tables of {n_entries} entries exceed {max_entries}')
+
+  # Same as Calculator.batch(), but returns a tuple of the results and of the
+  # rounded results of the metrics that were looked up.
+  def batch(self, columns: dict, skip = ()) -> tuple:
+    results = {}
+    rounded = {}
+    # Tables of the same inputs have the same ranges, so share positions
+    indices_by_keys = {}
+    for metric, (keys, table) in self.tables.items():
+      if metric in skip:
+        continue
+      if keys not in indices_by_keys:
+        pair = [columns.get(key) for key in keys]
+        if any(column is None for column in pair):
+          indices_by_keys[keys] = None
+        else:
+          indices_by_keys[keys] = table.get_indices(*pair)
+      indices = indices_by_keys.get(keys)
+      if indices is not None:
+        results[metric], rounded[metric] = table.gather(indices)
+    results.update(self.calc.batch(columns, skip=set(skip) | results.keys()))
+    return results, rounded
+
+  # Returns the weights that give each of `context_bmis` at a height, or None
+  # if the height is not a whole number within the table.
+  def get_context_weights(self, height: float) -> tuple or None:
+    if not float(height).is_integer() or int(height) not in self.height:
+      return None
+    if self.weights is None:
+      bmis = self.context_bmis
+      calc = self.calc
+      self.weights = [
+        tuple(calc.bmi_and_height_to_weight(Inputs(height=h), bmi) for bmi in bmis)
+        for h in self.height
+      ]
+    return self.weights[int(height) - self.height.start]
@@ -0,0 +1,138 @@
+# Asyncio client of the scoring service's Unix socket.
+# One connection is reused for every request, and requests are pipelined:
+# any number can be in flight, their replies are matched by id.
+#   async with ScoringClient() as client:
+#     scores = await client.score({'height': 175, 'mass': 65})
+# LocalScorer has the same interface, but scores in-process with the
+# calculator, for running without a service.
+
+# Imports
+import os, json, asyncio
+
+# Internal imports
+from . import scorer
+
+# Variables
+line_limit = 64 * 1024 * 1024
+
+# Helper functions
+
+# Same path as service.get_socket_path(), without needing GLib.
+def get_socket_path() -> str:
+  runtime_dir = os.environ.get('XDG_RUNTIME_DIR') or os.path.expanduser('~/.cache')
+  return os.path.join(runtime_dir, 'bmi', 'scorer.sock')
+
+class ScoringError(Exception):
+  pass
+
+class ScoringClient:
+
+  def __init__(self, path: str or None = None, timeout: float = 5.0):
+    self.path = path or get_socket_path()
+    self.timeout = timeout
+    self.reader = None
+    self.writer = None
+    self.read_task = None
+    self.pending = {}
+    self.next_id = 0
+
+  async def __aenter__(self):
+    await self.connect()
+    return self
+
+  async def __aexit__(self, *args):
+    await self.close()
+
+  async def connect(self):
+    self.reader, self.writer = await asyncio.wait_for(
+      asyncio.open_unix_connection(self.path, limit=line_limit), self.timeout,
+    )
+    self.read_task = asyncio.create_task(self.read_replies())
+
+  async def close(self):
+    if self.writer is None:
+      return
+    self.read_task.cancel()
+    self.writer.close()
+    try:
+      await self.writer.wait_closed()
+    except ConnectionError:
+      pass
+    self.reader = self.writer = self.read_task = None
+    self.fail_pending(ConnectionError('Connection closed'))
+
+  async def score(self, inputs: dict) -> dict:
+    return await self.request('Score', inputs)
+
+  async def score_many(self, rows: list) -> list:
+    return await self.request('ScoreMany', rows)
+
+  async def stats(self) -> dict:
+    return await self.request('Stats')
+
+  # Sends a request and waits for its reply, raises ScoringError if the
+  # service rejected it and TimeoutError if it took too long.
+  async def request(self, method: str, params = None):
+    if self.writer is None:
+      await self.connect()
+    self.next_id += 1
+    request_id = self.next_id
+    future = asyncio.get_running_loop().create_future()
+    self.pending[request_id] = future
+    message = {'id': request_id, 'method': method, 'params': params}
+    self.writer.write((json.dumps(message) + '\n').encode())
+    try:
+      await self.writer.drain()
+      return await asyncio.wait_for(future, self.timeout)
+    finally:
+      self.pending.pop(request_id, None)
+
+  async def read_replies(self):
+    try:
+      while True:
+        line = await self.reader.readline()
+        if not line:
+          break
+        reply = json.loads(line)
+        future = self.pending.get(reply.get('id'))
+        if future is None or future.done():
+          continue
+        if 'error' in reply:
+          future.set_exception(ScoringError(reply.get('error')))
+        else:
+          future.set_result(reply.get('result'))
+    except (ConnectionError, ValueError) as e:
+      self.fail_pending(e)
+      return
+    self.fail_pending(ConnectionError('Connection closed by the service'))
+
+  def fail_pending(self, error: Exception):
+    for future in self.pending.values():
+      if not future.done():
+        future.set_exception(error)
+
+class LocalScorer:
+
+  async def __aenter__(self):
+    return self
+
+  async def __aexit__(self, *args):
+    pass
+
+  async def connect(self):
+    pass
+
+  async def close(self):
+    pass
+
+  async def score(self, inputs: dict) -> dict:
+    return (await self.score_many([inputs]))[0]
+
+  async def score_many(self, rows: list) -> list:
+    try:
+      return scorer.score_rows([scorer.parse_row(row) for row in rows])
+    except ValueError as e:
+      raise ScoringError(str(e))
+
+  async def stats(self) -> dict:
+    return {}
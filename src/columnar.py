@@ -0,0 +1,163 @@
+# Binary columnar format for cohorts of inputs (.bmic).
+# A little-endian header is followed by one fixed-width column per input:
+#   magic 'BMIC', version (u16), number of columns (u16), number of rows (u64)
+#   per column: name (16 bytes), type code (1 byte), padding, offset (u64)
+# Columns are float32 ('f'), except gender which is int8 ('b'), and start at
+# 8-byte aligned offsets. Only inputs are stored, other columns of converted
+# files, such as ids, are left out. Readers map the file and hand out memoryviews of
+# the columns, so nothing is copied until the values are used.
+
+# Imports
+import sys, mmap, struct, tempfile
+from array import array
+
+# Variables
+magic = b'BMIC'
+version = 1
+header_struct = struct.Struct('<4sHHQ')
+column_struct = struct.Struct('<16sc7xQ')
+alignment = 8
+# Types that columns may have, as struct type codes
+type_codes = ('b', 'f', 'd')
+column_types = {
+  'height': 'f',
+  'mass': 'f',
+  'waist': 'f',
+  'hip': 'f',
+  'age': 'f',
+  'gender': 'b',
+}
+
+# Helper functions
+def check_byteorder():
+  # Columns are cast to native types, which have to be little-endian
+  if sys.byteorder != 'little':
+    raise ValueError('Columnar files are only supported on little-endian machines')
+
+def align(offset: int) -> int:
+  return (offset + alignment - 1) // alignment * alignment
+
+class ColumnarReader:
+
+  def __init__(self, path: str):
+    check_byteorder()
+    self.file = open(path, 'rb')
+    try:
+      self.mapped = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+    except ValueError:
+      self.file.close()
+      raise ValueError(f"'{path}' is empty")
+    self.columns = {}
+    try:
+      self.read_header(path)
+    except ValueError:
+      self.close()
+      raise
+    except struct.error:
+      self.close()
+      raise ValueError(f"The header of '{path}' is truncated") from None
+
+  def read_header(self, path: str):
+    file_magic, file_version, n_columns, n_rows = header_struct.unpack_from(self.mapped, 0)
+    if file_magic != magic:
+      raise ValueError(f"'{path}' is not a columnar file")
+    if file_version != version:
+      raise ValueError(f"Unsupported columnar file version {file_version}")
+    self.n_rows = n_rows
+    view = memoryview(self.mapped)
+    for i in range(n_columns):
+      entry_offset = header_struct.size + i * column_struct.size
+      name, type_code, offset = column_struct.unpack_from(self.mapped, entry_offset)
+      name = name.rstrip(b'\0').decode(errors='replace')
+      type_code = type_code.decode(errors='replace')
+      if type_code not in type_codes:
+        raise ValueError(f"Column '{name}' of '{path}' has an unknown type")
+      size = struct.calcsize(type_code)
+      if offset + n_rows * size > len(self.mapped):
+        raise ValueError(f"Column '{name}' of '{path}' is truncated")
+      self.columns[name] = view[offset:offset + n_rows * size].cast(type_code)
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, *args):
+    self.close()
+
+  def get_n_rows(self) -> int:
+    return self.n_rows
+
+  # Returns the columns as memoryviews into the mapped file.
+  def get_columns(self) -> dict:
+    return self.columns
+
+  def close(self):
+    for column in self.columns.values():
+      column.release()
+    self.columns = {}
+    try:
+      self.mapped.close()
+    except BufferError:
+      # Slices of the columns are still in use, the map is closed once
+      # they are garbage collected.
+      pass
+    self.file.close()
+
+# Writes columns chunk by chunk. Each column is buffered in its own temporary
+# file until close(), when the header and the columns are written.
+class ColumnarWriter:
+
+  # `types` are the type codes of the known columns, in file order.
+  def __init__(self, path: str, keys: list, types: dict = column_types):
+    check_byteorder()
+    unknown = [key for key in keys if key not in types]
+    if unknown:
+      raise ValueError(f"Unknown columns: {', '.join(unknown)}")
+    self.path = path
+    self.types = types
+    self.keys = [key for key in types if key in keys]
+    self.n_rows = 0
+    self.temp_files = {key: tempfile.TemporaryFile() for key in self.keys}
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, exc_type, exc_value, traceback):
+    if exc_type is None:
+      self.close()
+    else:
+      self.discard()
+
+  # Appends equally long columns of values.
+  def append(self, columns: dict):
+    n_rows = None
+    for key in self.keys:
+      values = array(self.types.get(key), columns[key])
+      if n_rows is not None and len(values) != n_rows:
+        raise ValueError('Columns have different lengths')
+      n_rows = len(values)
+      values.tofile(self.temp_files.get(key))
+    self.n_rows += n_rows or 0
+
+  def close(self):
+    offset = align(header_struct.size + column_struct.size * len(self.keys))
+    entries = []
+    for key in self.keys:
+      entries.append((key, offset))
+      offset = align(offset + self.n_rows * struct.calcsize(self.types.get(key)))
+    with open(self.path, 'wb') as file:
+      file.write(header_struct.pack(magic, version, len(self.keys), self.n_rows))
+      for key, column_offset in entries:
+        type_code = self.types.get(key).encode()
+        file.write(column_struct.pack(key.encode(), type_code, column_offset))
+      for key, column_offset in entries:
+        file.write(b'\0' * (column_offset - file.tell()))
+        temp_file = self.temp_files.get(key)
+        temp_file.seek(0)
+        while data := temp_file.read(1 << 20):
+          file.write(data)
+    self.discard()
+
+  def discard(self):
+    for temp_file in self.temp_files.values():
+      temp_file.close()
+    self.temp_files = {}
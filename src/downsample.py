@@ -0,0 +1,91 @@
+# Downsampling of long lines for drawing.
+# LTTB (largest triangle three buckets) keeps the first and last points, and
+# from each bucket in between the point that makes the largest triangle with
+# the point kept before it and the average of the next bucket, so peaks and
+# dips survive where averaging would flatten them.
+# DownsampledLine keeps a pyramid of a line, each level half as long as the
+# one below, so that showing a range only downsamples about twice as many
+# points as there are pixels, however long the line is.
+#   line = DownsampledLine(times, values)
+#   xs, ys = line.get_range(start, end, width)
+
+# Imports
+import math
+from bisect import bisect_left, bisect_right
+
+# Variables
+# Levels are halved until they are this short
+min_level_points = 256
+
+# Functions
+
+# Returns `n` points of the line as lists of x and y values.
+def lttb(x, y, n: int) -> tuple:
+  length = len(x)
+  if n >= length or n < 3:
+    return list(x), list(y)
+  sampled_x = [x[0]]
+  sampled_y = [y[0]]
+  bucket_size = (length - 2) / (n - 2)
+  kept = 0
+  for i in range(n - 2):
+    start = int(i * bucket_size) + 1
+    end = int((i + 1) * bucket_size) + 1
+    if i == n - 3:
+      next_x, next_y = x[-1], y[-1]
+    else:
+      next_end = min(int((i + 2) * bucket_size) + 1, length)
+      next_x = sum(x[end:next_end]) / (next_end - end)
+      next_y = sum(y[end:next_end]) / (next_end - end)
+    kept_x, kept_y = x[kept], y[kept]
+    # Twice the triangle's area, without abs() as only the largest counts
+    dx = kept_x - next_x
+    dy = next_y - kept_y
+    best_area = -1.0
+    for j in range(start, end):
+      area = dx * (y[j] - kept_y) + (x[j] - kept_x) * dy
+      if area < 0:
+        area = -area
+      if area > best_area:
+        best_area = area
+        kept = j
+    sampled_x.append(x[kept])
+    sampled_y.append(y[kept])
+  sampled_x.append(x[-1])
+  sampled_y.append(y[-1])
+  return sampled_x, sampled_y
+
+# A line sorted by x, without its NaN values, downsampled per shown range.
+class DownsampledLine:
+
+  def __init__(self, x, y):
+    points = [(float(a), float(b)) for a, b in zip(x, y) if not math.isnan(b)]
+    x = [a for a, b in points]
+    y = [b for a, b in points]
+    self.levels = [(x, y)]
+    while len(x) > 2 * min_level_points:
+      x, y = lttb(x, y, len(x) // 2)
+      self.levels.append((x, y))
+
+  def get_n_points(self) -> int:
+    return len(self.levels[0][0])
+
+  # Returns the first and last x values, or None without points.
+  def get_x_range(self) -> tuple or None:
+    x = self.levels[0][0]
+    return (x[0], x[-1]) if x else None
+
+  def get_y_range(self) -> tuple or None:
+    y = self.levels[0][1]
+    return (min(y), max(y)) if y else None
+
+  # Returns at most `n` points from `start` to `end`, and the points just
+  # outside them, so that a line drawn through them reaches the edges.
+  def get_range(self, start: float, end: float, n: int) -> tuple:
+    # The coarsest level that still has twice the points in the range
+    for x, y in reversed(self.levels):
+      low = max(bisect_left(x, start) - 1, 0)
+      high = min(bisect_right(x, end) + 1, len(x))
+      if high - low >= 2 * n:
+        break
+    return lttb(x[low:high], y[low:high], n)
@@ -0,0 +1,103 @@
+# Imports
+import math
+
+# Latency histogram with logarithmic buckets.
+# Each power of two is split into `precision` buckets, so percentiles are
+# accurate to within 2 ** (1 / precision) while memory stays constant.
+class Histogram:
+
+  def __init__(self, lowest: float = 1e-6, highest: float = 100.0, precision: int = 8):
+    self.lowest = lowest
+    self.precision = precision
+    n_buckets = math.ceil(math.log2(highest / lowest) * precision) + 1
+    self.counts = [0] * n_buckets
+    self.count = 0
+    self.total = 0.0
+    self.maximum = 0.0
+
+  def get_bucket(self, value: float) -> int:
+    if value <= self.lowest:
+      return 0
+    bucket = int(math.log2(value / self.lowest) * self.precision)
+    return min(bucket, len(self.counts) - 1)
+
+  # Returns the upper bound of a bucket.
+  def get_bucket_value(self, bucket: int) -> float:
+    return self.lowest * 2 ** ((bucket + 1) / self.precision)
+
+  def record(self, value: float):
+    self.counts[self.get_bucket(value)] += 1
+    self.count += 1
+    self.total += value
+    if value > self.maximum:
+      self.maximum = value
+
+  # Returns the value below which `percent` of the recorded values fall.
+  def get_percentile(self, percent: float) -> float:
+    if self.count == 0:
+      return 0.0
+    target = math.ceil(self.count * percent / 100)
+    seen = 0
+    for bucket, count in enumerate(self.counts):
+      seen += count
+      if seen >= target:
+        return min(self.get_bucket_value(bucket), self.maximum)
+    return self.maximum
+
+  def get_mean(self) -> float:
+    return self.total / self.count if self.count else 0.0
+
+  # Adds the values recorded by a histogram of the same buckets.
+  def merge(self, other):
+    self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+    self.count += other.count
+    self.total += other.total
+    self.maximum = max(self.maximum, other.maximum)
+
+  def reset(self):
+    self.counts = [0] * len(self.counts)
+    self.count = 0
+    self.total = 0.0
+    self.maximum = 0.0
+
+  # Returns a summary in milliseconds.
+  def to_dict(self) -> dict:
+    return {
+      'count': self.count,
+      'mean_ms': self.get_mean() * 1000,
+      'p50_ms': self.get_percentile(50) * 1000,
+      'p90_ms': self.get_percentile(90) * 1000,
+      'p99_ms': self.get_percentile(99) * 1000,
+      'max_ms': self.maximum * 1000,
+    }
+
+# Histogram of roughly the last `window` values.
+# Values go into the current histogram, which replaces the previous one once
+# it holds `window` values, so summaries cover between `window` and twice as
+# many of the latest values.
+class RollingHistogram:
+
+  def __init__(self, window: int = 1000, **kwargs):
+    self.window = window
+    self.kwargs = kwargs
+    self.current = Histogram(**kwargs)
+    self.previous = Histogram(**kwargs)
+
+  def record(self, value: float):
+    if self.current.count >= self.window:
+      self.previous, self.current = self.current, self.previous
+      self.current.reset()
+    self.current.record(value)
+
+  def get_histogram(self) -> Histogram:
+    histogram = Histogram(**self.kwargs)
+    histogram.merge(self.previous)
+    histogram.merge(self.current)
+    return histogram
+
+  def reset(self):
+    self.current.reset()
+    self.previous.reset()
+
+  def to_dict(self) -> dict:
+    return self.get_histogram().to_dict()
@@ -0,0 +1,257 @@
+# Measurement history.
+# Entries of a timestamp, the inputs and the resulting metrics are appended
+# to a log of fixed-size records, which is merged into a compacted columnar
+# file (see columnar.py) sorted by time once it grows. The log starts with
+# the keys of its records, as they change with the registered metrics, and
+# the number of compacted rows its entries are not part of yet:
+#   magic 'BMIL', version (u16), number of keys (u16), compacted rows (u64),
+#   per key a name (16 bytes)
+# followed by records of a little-endian double per key. The compacted file is
+# read through a memory map, and its time column is the index of date-range
+# queries, which are answered by binary search without reading the rest.
+#   store = HistoryStore()
+#   store.append(time.time(), inputs)
+#   columns = store.query(start, end)
+
+# Imports
+import os, math, struct
+from array import array
+from bisect import bisect_left, bisect_right, insort
+
+# Internal imports
+from . import metrics
+from .calculator import Inputs, input_keys, as_inputs
+from .columnar import ColumnarReader, ColumnarWriter
+
+# Variables
+metric_names = tuple(metrics.registry)
+history_keys = ('time',) + input_keys + metric_names
+# Gender is a float too, so that unset inputs can be NaN everywhere
+history_types = {'time': 'd'} | {key: 'f' for key in input_keys + metric_names}
+log_magic = b'BMIL'
+log_version = 2
+log_header_struct = struct.Struct('<4sHHQ')
+log_key_struct = struct.Struct('<16s')
+log_struct = struct.Struct('<' + 'd' * len(history_keys))
+log_name = 'history.log'
+compacted_name = 'history.bmic'
+compact_threshold = 256
+
+# Helper functions
+def get_data_dir() -> str:
+  data_dir = os.environ.get('XDG_DATA_HOME') or os.path.expanduser('~/.local/share')
+  # Not 'bmi', which is where user installs put their data files
+  return os.path.join(data_dir, 'io.github.philippkosarev.bmi')
+
+# Returns the metrics of the inputs, NaN for those that can not be calculated.
+def score_inputs(inputs: Inputs) -> dict:
+  results = {}
+  for metric in metric_names:
+    try:
+      result = metrics.registry[metric].function(inputs)
+    except (TypeError, ZeroDivisionError):
+      result = None
+    results[metric] = math.nan if result is None else result
+  return results
+
+# Returns the header of a log of records of `keys`, written next to a
+# compacted file of `n_compacted` rows.
+def pack_log_header(keys: tuple, n_compacted: int) -> bytes:
+  header = log_header_struct.pack(log_magic, log_version, len(keys), n_compacted)
+  return header + b''.join(log_key_struct.pack(key.encode()) for key in keys)
+
+# Returns the keys of a log's records, the number of compacted rows in its
+# header and the offset of the first record, raises ValueError if the log has
+# no valid header.
+def unpack_log_header(data: bytes, path: str) -> tuple:
+  try:
+    magic, version, n_keys, n_compacted = log_header_struct.unpack_from(data, 0)
+    keys = tuple(
+      log_key_struct.unpack_from(data, log_header_struct.size + i * log_key_struct.size)[0]
+      .rstrip(b'\0').decode()
+      for i in range(n_keys)
+    )
+  except (struct.error, UnicodeDecodeError):
+    raise ValueError(f"'{path}' is not a history log") from None
+  if magic != log_magic:
+    raise ValueError(f"'{path}' is not a history log")
+  if version != log_version:
+    raise ValueError(f"Unsupported history log version {version}")
+  if 'time' not in keys:
+    raise ValueError(f"The records of '{path}' have no time")
+  return keys, n_compacted, log_header_struct.size + n_keys * log_key_struct.size
+
+# Returns an entry's values as they are stored in the compacted file.
+def to_stored(values: list) -> list:
+  return [values[0]] + list(array('f', values[1:]))
+
+class HistoryStore:
+
+  def __init__(self, directory: str or None = None):
+    self.directory = directory or get_data_dir()
+    self.log_path = os.path.join(self.directory, log_name)
+    self.compacted_path = os.path.join(self.directory, compacted_name)
+    self.reader = None
+    self.log_file = None
+    # Entries of the log as tuples in history_keys order, sorted by time
+    self.log = []
+    self.load()
+
+  def load(self):
+    if os.path.exists(self.compacted_path):
+      self.reader = ColumnarReader(self.compacted_path)
+    try:
+      with open(self.log_path, 'rb') as file:
+        data = file.read()
+    except FileNotFoundError:
+      data = b''
+    n_compacted = self.get_n_compacted()
+    if data:
+      keys, log_n_compacted, offset = unpack_log_header(data, self.log_path)
+    else:
+      keys, log_n_compacted, offset = history_keys, n_compacted, 0
+    record_struct = struct.Struct('<' + 'd' * len(keys))
+    # A partly written last record is dropped
+    n_records = (len(data) - offset) // record_struct.size
+    end = offset + n_records * record_struct.size
+    records = record_struct.iter_unpack(data[offset:end])
+    if keys != history_keys:
+      # Keys of metrics registered since are NaN, those of removed ones dropped
+      indices = [keys.index(key) if key in keys else None for key in history_keys]
+      records = (
+        tuple(math.nan if i is None else record[i] for i in indices)
+        for record in records
+      )
+    self.log = sorted(records)
+    # If compact() was interrupted after replacing the compacted file, it
+    # has the log's entries on top of the rows the log was written next to
+    merged = n_compacted != log_n_compacted and n_compacted == log_n_compacted + len(self.log)
+    if merged:
+      self.log = []
+    if len(data) != end or merged or keys != history_keys:
+      self.rewrite_log()
+
+  def close(self):
+    if self.log_file is not None:
+      self.log_file.close()
+      self.log_file = None
+    if self.reader is not None:
+      self.reader.close()
+      self.reader = None
+
+  # Adds an entry, calculating the metrics of the inputs unless given.
+  def append(self, timestamp: float, inputs, results: dict or None = None):
+    inputs = as_inputs(inputs)
+    if results is None:
+      results = score_inputs(inputs)
+    values = [timestamp]
+    values += [math.nan if value is None else value for value in map(inputs.get, input_keys)]
+    values += [results.get(metric, math.nan) for metric in metric_names]
+    if self.log_file is None:
+      os.makedirs(self.directory, exist_ok=True)
+      self.log_file = open(self.log_path, 'ab')
+      if not self.log_file.tell():
+        self.log_file.write(pack_log_header(history_keys, self.get_n_compacted()))
+    self.log_file.write(log_struct.pack(*values))
+    self.log_file.flush()
+    insort(self.log, tuple(values))
+    if len(self.log) >= compact_threshold:
+      self.compact()
+
+  def get_n_compacted(self) -> int:
+    return self.reader.get_n_rows() if self.reader is not None else 0
+
+  def get_n_entries(self) -> int:
+    return self.get_n_compacted() + len(self.log)
+
+  # Returns the earliest and latest times, or None if there are no entries.
+  def get_time_range(self) -> tuple or None:
+    times = []
+    if self.reader is not None and self.reader.get_n_rows():
+      compacted_times = self.reader.get_columns().get('time')
+      times += [compacted_times[0], compacted_times[-1]]
+    if self.log:
+      times += [self.log[0][0], self.log[-1][0]]
+    if not times:
+      return None
+    return min(times), max(times)
+
+  # Returns whether the inputs are those of the latest entry, as stored.
+  def is_latest(self, inputs) -> bool:
+    latest = self.get_latest()
+    if latest is None:
+      return False
+    inputs = as_inputs(inputs)
+    values = to_stored([0.0] + [inputs.get(key, math.nan) for key in input_keys])
+    latest = to_stored(latest)
+    # `a != a` is only true for NaN
+    return all(
+      a == b or (a != a and b != b)
+      for a, b in zip(values[1:], latest[1:1 + len(input_keys)])
+    )
+
+  # Returns the latest entry as a tuple in history_keys order.
+  def get_latest(self) -> tuple or None:
+    latest = self.log[-1] if self.log else None
+    if self.reader is not None and self.reader.get_n_rows():
+      columns = self.reader.get_columns()
+      if latest is None or columns.get('time')[-1] > latest[0]:
+        n_rows = self.reader.get_n_rows()
+        latest = tuple(self.get_compacted_column(key, n_rows - 1, n_rows)[0] for key in history_keys)
+    return latest
+
+  # Returns the entries from `start` to `end` (inclusive, in seconds since
+  # the epoch) as a dict of columns keyed like history_keys, sorted by time.
+  # Without entries in the log, the columns are slices of the mapped file.
+  def query(self, start: float = -math.inf, end: float = math.inf) -> dict:
+    columns = {key: array(history_types.get(key)) for key in history_keys}
+    if self.reader is not None:
+      compacted = self.reader.get_columns()
+      times = compacted.get('time')
+      low = bisect_left(times, start)
+      high = bisect_right(times, end)
+      columns = {key: self.get_compacted_column(key, low, high) for key in history_keys}
+    log_times = [entry[0] for entry in self.log]
+    entries = self.log[bisect_left(log_times, start):bisect_right(log_times, end)]
+    if not entries:
+      return columns
+    rows = list(zip(*columns.values())) + [tuple(to_stored(entry)) for entry in entries]
+    if columns.get('time') and columns.get('time')[-1] > entries[0][0]:
+      rows.sort(key=lambda row: row[0])
+    merged = zip(*rows)
+    return {key: array(history_types.get(key), values) for key, values in zip(history_keys, merged)}
+
+  # Returns rows `low` to `high` of a compacted column, NaN for columns of
+  # metrics registered after the file was written.
+  def get_compacted_column(self, key: str, low: int, high: int):
+    column = self.reader.get_columns().get(key)
+    if column is None:
+      return array(history_types.get(key), [math.nan]) * (high - low)
+    return column[low:high]
+
+  # Merges the log into the compacted file, which is replaced atomically.
+  # The log is only emptied after that, see load() for when it is not.
+  # Its header still counts the rows before, so the merge can be told apart.
+  def compact(self):
+    if not self.log:
+      return
+    columns = self.query()
+    temp_path = self.compacted_path + '.tmp'
+    with ColumnarWriter(temp_path, history_keys, history_types) as writer:
+      writer.append(columns)
+    if self.reader is not None:
+      self.reader.close()
+    os.replace(temp_path, self.compacted_path)
+    self.reader = ColumnarReader(self.compacted_path)
+    self.log = []
+    self.rewrite_log()
+
+  def rewrite_log(self):
+    if self.log_file is not None:
+      self.log_file.close()
+    os.makedirs(self.directory, exist_ok=True)
+    self.log_file = open(self.log_path, 'wb')
+    self.log_file.write(pack_log_header(history_keys, self.get_n_compacted()))
+    for entry in self.log:
+      self.log_file.write(log_struct.pack(*entry))
+    self.log_file.flush()
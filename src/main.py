@@ -26,7 +26,7 @@ from gi.repository import Gtk, Adw, Gio, GObject
 
 # Internal imports
 from .window import BmiWindow
-from .preferences import BmiPreferences
+from . import startup, timings
 
 # The main application singleton class
 class BmiApplication(Adw.Application):
@@ -37,7 +37,7 @@ class BmiApplication(Adw.Application):
     type = Gio.Settings,
   )
 
-  def __init__(self, version: str):
+  def __init__(self, version: str, service: bool = False):
     super().__init__(
       application_id='io.github.philippkosarev.bmi',
       flags = Gio.ApplicationFlags.DEFAULT_FLAGS,
@@ -45,6 +45,19 @@ class BmiApplication(Adw.Application):
     )
     self.get_id = self.get_application_id
     self.set_settings(Gio.Settings.new(self.get_id()))
+    self.preferences = None
+    self.about = None
+    self.win = None
+    # In service mode only the scoring service runs, without a window, until
+    # the application is launched again
+    self.service_mode = service
+    self.skip_activation = service
+    # Only the service, and windows that record timings for DumpStats, export
+    # the scoring service. Its imports would slow down starting the window.
+    self.scoring_service = None
+    if service or timings.is_enabled() or self.get_settings()['record-timings']:
+      from .service import ScoringService
+      self.scoring_service = ScoringService()
     # Application-wide shortcuts
     self.create_action('preferences', self.show_preferences, ['<primary>comma'])
     self.create_action('about', self.show_about, ['F1'])
@@ -56,16 +69,23 @@ class BmiApplication(Adw.Application):
   def get_settings(self) -> Gio.Settings:
     return self.settings
 
-  # Shows the preferences dialog.
+  # Shows the preferences dialog, creating it on first use.
   def show_preferences(self, action, param):
-    preferences = BmiPreferences()
-    preferences.set_settings(self.get_settings())
-    preferences.present(self.props.active_window)
+    if self.preferences is None:
+      # Imported on first use to keep it out of startup
+      from .preferences import BmiPreferences
+      self.preferences = BmiPreferences()
+      self.preferences.set_settings(self.get_settings())
+    self.preferences.present(self.props.active_window)
 
-  # Shows the about dialog.
+  # Shows the about dialog, creating it on first use.
   def show_about(self, action, param):
-    # Creating about dialog
-    about = Adw.AboutDialog(
+    if self.about is None:
+      self.about = self.create_about()
+    self.about.present(self.props.active_window)
+
+  def create_about(self) -> Adw.AboutDialog:
+    return Adw.AboutDialog(
       application_name  = 'BMI',
       application_icon  = self.get_id(),
       version           = self.get_version(),
@@ -89,19 +109,52 @@ class BmiApplication(Adw.Application):
       copyright    = '© 2024 Philipp Kosarev',
       license_type = 'GTK_LICENSE_GPL_2_0',
     )
-    about.present(self.props.active_window)
 
   def on_quit(self, action, param):
-    self.win.on_close_window(widget='')
+    if self.win:
+      self.win.on_close_request()
     self.quit()
 
+  # Exports the scoring service next to the application's own D-Bus objects.
+  def do_dbus_register(self, connection: Gio.DBusConnection, object_path: str) -> bool:
+    if not Adw.Application.do_dbus_register(self, connection, object_path):
+      return False
+    if self.scoring_service is not None:
+      self.scoring_service.register(connection, object_path)
+    return True
+
+  def do_dbus_unregister(self, connection: Gio.DBusConnection, object_path: str):
+    if self.scoring_service is not None:
+      self.scoring_service.unregister(connection)
+    Adw.Application.do_dbus_unregister(self, connection, object_path)
+
+  def do_startup(self):
+    Adw.Application.do_startup(self)
+    if self.service_mode:
+      # Keeps running without any window
+      self.hold()
+      self.scoring_service.listen()
+
+  def do_shutdown(self):
+    if self.scoring_service is not None:
+      self.scoring_service.stop()
+    if timings.is_enabled():
+      timings.dump()
+    Adw.Application.do_shutdown(self)
+
   # Called when the application is activated.
   def do_activate(self):
+    # The service's own launch, later ones are forwarded to it and open a window
+    if self.skip_activation:
+      self.skip_activation = False
+      return
     # We raise the application's main window, creating it if necessary.
     self.win = self.props.active_window
     if not self.win:
       self.win = BmiWindow(application=self)
     self.win.present()
+    startup.watch_first_frame(self.win)
+    timings.watch_frames(self.win)
 
   def create_action(self, name, callback, shortcuts=None):
     action = Gio.SimpleAction.new(name, None)
@@ -112,5 +165,9 @@ class BmiApplication(Adw.Application):
 
 # The application's entry point.
 def main(version):
-  app = BmiApplication(version)
-  return app.run(sys.argv)
+  argv = sys.argv
+  service = '--service' in argv[1:]
+  if service:
+    argv = [arg for arg in argv if arg != '--service']
+  app = BmiApplication(version, service)
+  return app.run(argv)
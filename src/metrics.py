@@ -0,0 +1,159 @@
+# Registry of the calculated metrics.
+# Each metric declares its function, threshold table and display digits, and
+# the window, the result dialogs, the history and the batch scorer are built
+# from the registry. Kept free of GTK so that they can be shared by the
+# window and the headless batch scorer.
+#   register(Metric('whr', _('Waist / Hip'), ...))
+
+# Imports
+import math
+from array import array
+from dataclasses import dataclass
+
+# Internal imports
+from .calculator import Calculator, LookupTables, Inputs
+from .thresholds import Threshold, ThresholdTable
+
+# Shorthand vars
+calc = Calculator()
+
+# A metric shown as a result row and scored in batches.
+# `function` takes Inputs and has an `inputs` attribute, see reads() of
+# calculator.py. Advanced metrics are only shown in advanced mode. `context`
+# and `sweep` describe the extra sections of the metric's result dialog.
+# A sweep varies its 'input' around the current value, with a line per value
+# of the (key, values) that 'lines' returns for the inputs, if any. It shows
+# the metric, or the 'result' of that name in sweep.derived_metrics.
+@dataclass(slots=True, frozen=True)
+class Metric:
+  name: str
+  title: str
+  tooltip: str
+  function: object
+  table: ThresholdTable
+  digits: int
+  advanced: bool = False
+  context: dict = None
+  sweep: dict = None
+
+  # Returns the inputs needed for both the value and the category.
+  def get_inputs(self) -> frozenset:
+    return self.function.inputs | self.table.get_inputs()
+
+  # Calculates the metric row by row, for metrics that Calculator.batch()
+  # does not know. Rows that can not be calculated are NaN.
+  def batch(self, columns: dict) -> array:
+    keys = list(self.function.inputs)
+    values = array('d')
+    for row in zip(*[columns[key] for key in keys]):
+      try:
+        value = self.function(Inputs(**dict(zip(keys, row))))
+      except (TypeError, ZeroDivisionError, ValueError):
+        value = None
+      values.append(math.nan if value is None else value)
+    return values
+
+# Variables
+registry = {}
+
+# Functions
+
+# Adds a metric, after the ones registered before it.
+def register(metric: Metric):
+  if metric.name in registry:
+    raise ValueError(f"Metric '{metric.name}' is already registered")
+  registry[metric.name] = metric
+
+def get_metric(name: str) -> Metric:
+  return registry[name]
+
+# Returns the names in a comma-separated list of metrics, raises ValueError
+# if one is not registered.
+def parse_metric_names(text: str) -> list:
+  names = [name.strip() for name in text.split(',') if name.strip()]
+  if not names:
+    raise ValueError('No metrics given')
+  unknown = [name for name in names if name not in registry]
+  if unknown:
+    raise ValueError(
+      f"Unknown metrics: {', '.join(unknown)}, known are {', '.join(registry)}"
+    )
+  return names
+
+# Built-in metrics
+bmi_thresholds = [
+  Threshold(_('Underweight [Severe]'),   0,    0),
+  Threshold(_('Underweight [Moderate]'), 16,   0),
+  Threshold(_('Underweight [Mild]'),     17,   0),
+  Threshold(_('Healthy'),                18.5, 1),
+  Threshold(_('Overweight'),             25,   2),
+  Threshold(_('Obese [Class 1]'),        30,   3),
+  Threshold(_('Obese [Class 2]'),        35,   3),
+  Threshold(_('Obese [Class 3]'),        40,   3),
+]
+
+whtr_thresholds = [
+  Threshold(_('Healthy'),   0,                   1),
+  Threshold(_('Unhealthy'), calc.whtr_unhealthy, 2),
+]
+
+whr_thresholds = [
+  Threshold(_('Healthy'),    0,                   1),
+  Threshold(_('Overweight'), calc.whr_overweight, 2),
+  Threshold(_('Obese'),      calc.whr_obese,      3),
+]
+
+bri_thresholds = [
+  Threshold(_('Very lean'),     0,    0),
+  Threshold(_('Lean'),          3.41, 1),
+  Threshold(_('Average'),       4.45, 1),
+  Threshold(_('Above average'), 5.46, 2),
+  Threshold(_('High'),          6.91, 3),
+]
+
+register(Metric(
+  'bmi', _('BMI'), _('Body Mass Index'),
+  calc.bmi, ThresholdTable(bmi_thresholds), 1,
+  context = {
+    'calc-function': calc.bmi_and_height_to_weight,
+    'table-function': lambda inputs: lookup_tables.get_context_weights(inputs.height),
+    'description': _("With the same height, this is what weight you need to get different BMI thresholds"),
+  },
+  sweep = {
+    'description': _("The weight for each BMI threshold at other heights"),
+    'input': 'height',
+    'lines': lambda inputs: ('bmi', tuple(t.value for t in bmi_thresholds if t.value)),
+    'result': 'target_weight',
+  },
+))
+register(Metric(
+  'whtr', _('Waist / Height'), _('Waist to height ratio'),
+  calc.whtr, ThresholdTable(whtr_thresholds), 2, advanced=True,
+  sweep = {
+    'description': _("How the result changes with the waist size"),
+    'input': 'waist',
+  },
+))
+register(Metric(
+  'whr', _('Waist / Hip'), _('Waist to hip ratio'),
+  calc.whr, ThresholdTable(whr_thresholds), 2, advanced=True,
+  sweep = {
+    'description': _("How the result changes with the waist size"),
+    'input': 'waist',
+  },
+))
+register(Metric(
+  'bri', _('BRI'), _('Body Roundness Index'),
+  calc.bri, ThresholdTable(bri_thresholds), 2, advanced=True,
+  sweep = {
+    'description': _("How the result changes with the waist size, at the same height and 10 cm either way"),
+    'input': 'waist',
+    'lines': lambda inputs: ('height', tuple(round(inputs.height) + d for d in (-10, 0, 10))),
+  },
+))
+
+# Results of whole-number inputs, built on first use
+lookup_tables = LookupTables(
+  {metric.name: metric.digits for metric in registry.values()},
+  context_bmis=[threshold.value for threshold in bmi_thresholds],
+)
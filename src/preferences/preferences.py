@@ -7,21 +7,20 @@ from .widgets.shared import *
 
 # Internal functions
 def on_settings_changed(self, param):
-  set_inital_row_values(self)
-  trigger_rows(self)
-
-def set_inital_row_values(self):
+  if self.settings_handler is not None:
+    self.settings_handler[0].disconnect(self.settings_handler[1])
+    self.settings_handler = None
   settings = self.get_settings()
   if settings is None:
     return
-  for row in self.get_rows():
-    key = row.get_key()
-    value = settings[key]
-    row.set_value(value)
+  set_inital_row_values(self)
+  handler_id = settings.connect('changed', self._on_settings_key_changed)
+  self.settings_handler = (settings, handler_id)
 
-def trigger_rows(self):
-  for row in self.get_rows():
-    self._on_row_value_changed(row)
+def set_inital_row_values(self):
+  settings = self.get_settings()
+  for key, row in self.rows_by_key.items():
+    row.set_value(settings[key])
 
 @Gtk.Template(resource_path='/io/github/philippkosarev/bmi/preferences/preferences.ui')
 class BmiPreferences(Adw.PreferencesDialog):
@@ -36,8 +35,11 @@ class BmiPreferences(Adw.PreferencesDialog):
 
   def __init__(self, **kwargs):
     super().__init__(**kwargs)
+    self.settings_handler = None
+    # Walking the widget tree is slow, so it is only done once
+    self.rows_by_key = {row.get_key(): row for row in self.find_rows()}
     self.connect('notify::settings', on_settings_changed)
-    for row in self.get_rows():
+    for row in self.rows_by_key.values():
       row.connect(row.get_signal(), self._on_row_value_changed)
 
   def get_settings(self) -> Gio.Settings:
@@ -46,6 +48,15 @@ class BmiPreferences(Adw.PreferencesDialog):
   def set_settings(self, settings: Gio.Settings):
     self.settings = settings
 
+  # Updates only the row of the changed key.
+  def _on_settings_key_changed(self, settings: Gio.Settings, key: str):
+    row = self.rows_by_key.get(key)
+    if row is None:
+      return
+    value = settings[key]
+    if row.get_value() != value:
+      row.set_value(value)
+
   def _on_row_value_changed(self, row: Adw.ActionRow, param = None):
     settings = self.get_settings()
     if settings is None:
@@ -81,8 +92,14 @@ class BmiPreferences(Adw.PreferencesDialog):
       ]
     return groups
 
-  def get_rows(self) -> list:
+  def find_rows(self) -> list:
     rows = []
     for group in self.get_groups():
       rows += group.get_rows()
     return rows
+
+  def get_rows(self) -> list:
+    return list(self.rows_by_key.values())
+
+  def get_row(self, key: str) -> Adw.ActionRow or None:
+    return self.rows_by_key.get(key)
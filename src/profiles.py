@@ -0,0 +1,190 @@
+# Named profiles, for devices that are shared between people.
+# A profile has its inputs and the results last calculated from them, as
+# (value, text, style) tuples per metric, so that switching to it shows them
+# without calculating. Profiles are kept in one compact JSON file, which is
+# replaced atomically when saved, and searched in memory. Each profile has its
+# own measurement history, in a directory named after it.
+#   store = ProfileStore()
+#   store.add('Ann', inputs, results)
+#   store.save()
+#   names = store.search('an')
+
+# Imports
+import os, json, shutil
+from bisect import bisect_right
+from urllib.parse import quote
+from dataclasses import dataclass, field
+
+# Internal imports
+from .calculator import Inputs, input_keys, as_inputs
+from .history import get_data_dir
+from .thresholds import n_styles
+
+# Variables
+profiles_name = 'profiles.json'
+histories_name = 'histories'
+version = 1
+
+# Helper functions
+def is_number(value) -> bool:
+  return type(value) in (int, float)
+
+# Returns whether a cached result is a (value, text, style) list, as
+# ThresholdTable.lookup() and the result rows take them.
+def is_cached_result(result) -> bool:
+  if not isinstance(result, list) or len(result) != 3:
+    return False
+  value, text, style = result
+  if text is None:
+    return style is None and (value is None or is_number(value))
+  return (
+    (value is None or is_number(value)) and isinstance(text, str)
+    and type(style) is int and 0 <= style < n_styles
+  )
+
+@dataclass(slots=True)
+class Profile:
+  name: str
+  inputs: Inputs
+  # Cached results keyed by metric name, as (value, text, style) tuples
+  results: dict = field(default_factory=dict)
+
+  # Inputs are stored as a list in input_keys order. Raises ValueError if
+  # the profile is not shaped like to_dict() returns.
+  @classmethod
+  def from_dict(cls, profile: dict):
+    if not isinstance(profile, dict):
+      raise ValueError('Profiles have to be objects')
+    name = profile.get('name')
+    inputs = profile.get('inputs')
+    results = profile.get('results', {})
+    if not isinstance(name, str):
+      raise ValueError('Profiles need a name')
+    if not isinstance(inputs, list) or len(inputs) > len(input_keys) or not all(
+      value is None or is_number(value) for value in inputs
+    ):
+      raise ValueError(f"The inputs of profile '{name}' are not a list of numbers")
+    if not isinstance(results, dict) or not all(map(is_cached_result, results.values())):
+      raise ValueError(f"The results of profile '{name}' are not (value, text, style) lists")
+    results = {metric: tuple(result) for metric, result in results.items()}
+    return cls(name, Inputs(*inputs), results)
+
+  def to_dict(self) -> dict:
+    return {
+      'name': self.name,
+      'inputs': [getattr(self.inputs, key) for key in input_keys],
+      'results': {metric: list(result) for metric, result in self.results.items()},
+    }
+
+class ProfileStore:
+
+  def __init__(self, directory: str or None = None):
+    self.directory = directory or get_data_dir()
+    self.path = os.path.join(self.directory, profiles_name)
+    self.profiles = {}
+    # Names sorted ignoring case, and their casefolded forms for searching
+    self.names = []
+    self.folded_names = []
+    # The last query and the positions of its matches
+    self.last_search = None
+    self.load()
+
+  def load(self):
+    try:
+      with open(self.path) as file:
+        data = json.load(file)
+    except FileNotFoundError:
+      return
+    if not isinstance(data, dict) or not isinstance(data.get('profiles'), list):
+      raise ValueError(f"'{self.path}' is not a profiles file")
+    if data.get('version') != version:
+      raise ValueError(f"Unsupported profiles version {data.get('version')}")
+    profiles = {}
+    for profile in data.get('profiles'):
+      profile = Profile.from_dict(profile)
+      profiles[profile.name] = profile
+    self.profiles = profiles
+    self.update_index()
+
+  # Writes all profiles to a temporary file, which then replaces the store.
+  def save(self):
+    os.makedirs(self.directory, exist_ok=True)
+    data = {
+      'version': version,
+      'profiles': [profile.to_dict() for profile in self.profiles.values()],
+    }
+    temp_path = self.path + '.tmp'
+    # dumps() encodes in C, unlike dump()
+    text = json.dumps(data, separators=(',', ':'))
+    with open(temp_path, 'w') as file:
+      file.write(text)
+    os.replace(temp_path, self.path)
+
+  def update_index(self):
+    self.names = sorted(self.profiles, key=str.casefold)
+    self.folded_names = [name.casefold() for name in self.names]
+    self.last_search = None
+
+  def get_n_profiles(self) -> int:
+    return len(self.profiles)
+
+  # Returns the names, sorted ignoring case.
+  def get_names(self) -> list:
+    return list(self.names)
+
+  def get(self, name: str) -> Profile or None:
+    return self.profiles.get(name)
+
+  # Returns the directory of a profile's history, see HistoryStore.
+  def get_history_dir(self, name: str) -> str:
+    return os.path.join(self.directory, histories_name, quote(name, safe=''))
+
+  # Adds a profile, raises ValueError if the name is empty or taken.
+  def add(self, name: str, inputs, results: dict or None = None) -> Profile:
+    name = name.strip()
+    if not name:
+      raise ValueError('Profiles need a name')
+    if name in self.profiles:
+      raise ValueError(f"There already is a profile named '{name}'")
+    profile = Profile(name, as_inputs(inputs), dict(results or {}))
+    self.profiles[name] = profile
+    folded_name = name.casefold()
+    i = bisect_right(self.folded_names, folded_name)
+    self.names.insert(i, name)
+    self.folded_names.insert(i, folded_name)
+    self.last_search = None
+    return profile
+
+  # Removes a profile along with its history.
+  def remove(self, name: str):
+    del self.profiles[name]
+    shutil.rmtree(self.get_history_dir(name), ignore_errors=True)
+    i = self.names.index(name)
+    del self.names[i]
+    del self.folded_names[i]
+    self.last_search = None
+
+  # Replaces a profile's inputs and cached results.
+  def update(self, name: str, inputs, results: dict):
+    profile = self.profiles[name]
+    profile.inputs = as_inputs(inputs)
+    profile.results = dict(results)
+
+  # Returns the names containing the query, ignoring case, those starting
+  # with it first. A query that extends the last one only searches the last
+  # one's matches, so typing a name narrows the search keystroke by keystroke.
+  def search(self, query: str) -> list:
+    query = query.strip().casefold()
+    if not query:
+      self.last_search = None
+      return list(self.names)
+    folded_names = self.folded_names
+    if self.last_search is not None and query.startswith(self.last_search[0]):
+      candidates = self.last_search[1]
+    else:
+      candidates = range(len(folded_names))
+    matches = [i for i in candidates if query in folded_names[i]]
+    self.last_search = (query, matches)
+    starting = [i for i in matches if folded_names[i].startswith(query)]
+    others = [i for i in matches if not folded_names[i].startswith(query)]
+    return [self.names[i] for i in starting + others]
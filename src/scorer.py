@@ -0,0 +1,508 @@
+# Headless batch scorer.
+# Streams CSV or JSONL rows through Calculator.batch() in fixed-size chunks,
+# so memory use stays bounded no matter how big the input is. Every input
+# column is passed through, and for every metric whose inputs are present a
+# value column and a '<metric>_category' column are appended.
+
+# Imports
+import sys, os, csv, json, math, mmap, shutil, tempfile, argparse, functools, multiprocessing
+from itertools import islice, chain
+from concurrent.futures import ProcessPoolExecutor
+
+# Internal imports
+from . import metrics, units
+from .calculator import Gender
+from .columnar import ColumnarReader, ColumnarWriter
+
+# Variables
+input_keys = ['height', 'mass', 'waist', 'hip', 'age', 'gender']
+integer_keys = ['age', 'gender']
+formats = ['csv', 'jsonl', 'bmic']
+chunk_size = 8192
+buffer_size = 1 << 20
+# Errors of rows that can not be parsed or scored, see find_row_error()
+row_errors = (ValueError, IndexError, ArithmeticError)
+
+# Helper functions
+def guess_format(path: str or None) -> str:
+  if path is not None and path.endswith(('.jsonl', '.ndjson')):
+    return 'jsonl'
+  if path is not None and path.endswith('.bmic'):
+    return 'bmic'
+  return 'csv'
+
+def open_input(path: str or None):
+  if path is None or path == '-':
+    return open(sys.stdin.fileno(), 'r', buffering=buffer_size, newline='', closefd=False)
+  return open(path, 'r', buffering=buffer_size, newline='')
+
+def open_output(path: str or None):
+  if path is None or path == '-':
+    return open(sys.stdout.fileno(), 'w', buffering=buffer_size, newline='', closefd=False)
+  return open(path, 'w', buffering=buffer_size, newline='')
+
+# Raises ValueError unless the value is a number, or a string of one.
+def parse_value(key: str, value) -> float or int:
+  if not isinstance(value, (str, int, float)) or isinstance(value, bool):
+    raise ValueError(f"'{key}' is {json.dumps(value)}, not a number")
+  try:
+    if key in integer_keys:
+      return int(float(value))
+    return float(value)
+  except (ValueError, OverflowError):
+    raise ValueError(f"'{key}' is {value!r}, not a number") from None
+
+# A row that can not be parsed, with its line in the input counting from 1.
+class RowError(ValueError):
+
+  def __init__(self, line: int, reason: str):
+    super().__init__(f'Line {line}: {reason}')
+    self.line = line
+    self.reason = reason
+
+  # Keeps the line when raised in a worker process
+  def __reduce__(self):
+    return (RowError, (self.line, self.reason))
+
+# Returns a RowError for the first of the (line, row) tuples that `score`
+# fails to score on its own, or None if they all can be.
+def find_row_error(numbered_rows: list, score) -> RowError or None:
+  for line, row in numbered_rows:
+    try:
+      score([(line, row)])
+    except RowError as e:
+      return e
+    except IndexError:
+      return RowError(line, 'There are fewer fields than in the header')
+    except row_errors as e:
+      return RowError(line, str(e))
+  return None
+
+def load_json_row(line: str, number: int):
+  try:
+    return json.loads(line)
+  except ValueError as e:
+    raise RowError(number, str(e)) from None
+
+# Returns the column of each input among column names, as a tuple of the
+# column name and the factor to the input's unit. Columns may be named like
+# the input, or carry a unit like mass_lb, see units.parse_column_name().
+def get_input_columns(names) -> dict:
+  return find_input_columns(tuple(names))
+
+@functools.lru_cache(maxsize=64)
+def find_input_columns(names: tuple) -> dict:
+  columns = {}
+  for name in names:
+    if name in input_keys:
+      key, factor = name, 1.0
+    else:
+      parsed = units.parse_column_name(name)
+      if parsed is None:
+        continue
+      key, factor = parsed
+    if key in columns:
+      raise ValueError(f"Both '{columns[key][0]}' and '{name}' give the {key}")
+    columns[key] = (name, factor)
+  return {key: columns[key] for key in input_keys if key in columns}
+
+# Converts the columns of get_input_columns() that are in other units.
+def convert_columns(columns: dict, input_columns: dict) -> dict:
+  for key, (name, factor) in input_columns.items():
+    if factor != 1:
+      columns[key] = units.convert_column(columns[key], factor)
+  return columns
+
+# Returns the metrics that can be scored with the given input keys, in the
+# order of the registry. Only the names in `selection` are scored, if given.
+def scorable_metrics(keys: list, selection: frozenset or None = None) -> list:
+  available = set(keys)
+  return [
+    name for name, metric in metrics.registry.items()
+    if (selection is None or name in selection)
+    and metric.get_inputs() <= available
+  ]
+
+def output_keys(metric_names: list) -> list:
+  keys = []
+  for metric in metric_names:
+    keys += [metric, metric + '_category']
+  return keys
+
+# Returns the output value and category label of every metric, row by row.
+# Metrics that are not in `metric_names` are not calculated.
+def score_columns(columns: dict, n_rows: int, metric_names: list) -> list:
+  skip = [name for name in metrics.registry if name not in metric_names]
+  results, rounded = metrics.lookup_tables.batch(columns, skip)
+  rows = [{} for i in range(n_rows)]
+  for metric in metric_names:
+    table = metrics.registry[metric].table
+    digits = metrics.registry[metric].digits
+    category_key = metric + '_category'
+    values = results.get(metric)
+    if values is None:
+      values = metrics.registry[metric].batch(columns)
+    shown = rounded.get(metric)
+    if shown is None:
+      shown = [round(value, digits) for value in values]
+    # Columns of the callable thresholds, in the table's order
+    bounds = [results[name] for name in table.get_function_names()]
+    for row, value, shown_value, *row_bounds in zip(rows, values, shown, *bounds):
+      if math.isnan(value):
+        row[metric] = None
+        row[category_key] = None
+        continue
+      if row_bounds:
+        table.set_function_values(row_bounds)
+      text, style = table.lookup(value)
+      row[metric] = shown_value
+      row[category_key] = text
+  return rows
+
+# Returns the known inputs of a row parsed to numbers, raises ValueError if
+# the row is not a dict, or an input is not a number or not a valid gender.
+# Given the row's line, raises RowError instead.
+def parse_row(row: dict, line: int or None = None) -> dict:
+  try:
+    if not isinstance(row, dict):
+      raise ValueError(f'Rows have to be objects of inputs, not {json.dumps(row)}')
+    parsed = {}
+    for key, (name, factor) in get_input_columns(row).items():
+      value = parse_value(key, row[name])
+      parsed[key] = value if factor == 1 else value * factor
+    if 'gender' in parsed:
+      Gender(parsed.get('gender'))
+  except ValueError as e:
+    if line is None:
+      raise
+    raise RowError(line, str(e)) from None
+  return parsed
+
+# Scores parsed rows, which may have different inputs, in one batch call per
+# set of inputs. Returns the scores of each row, in the same order.
+def score_rows(rows: list, selection: frozenset or None = None) -> list:
+  groups = {}
+  for i, row in enumerate(rows):
+    keys = tuple(key for key in input_keys if key in row)
+    groups.setdefault(keys, []).append(i)
+  results = [None] * len(rows)
+  for keys, indices in groups.items():
+    columns = {key: [rows[i][key] for i in indices] for key in keys}
+    scored = score_columns(columns, len(indices), scorable_metrics(keys, selection))
+    for i, scores in zip(indices, scored):
+      results[i] = scores
+  return results
+
+# Scoring functions
+# Each takes the `selection` of scorable_metrics().
+def score_csv(infile, outfile, selection: frozenset or None = None):
+  reader = csv.reader(infile)
+  header = next(reader, None)
+  if header is None:
+    return 0
+  writer = csv.writer(outfile)
+  writer.writerow(header + output_keys(scorable_metrics(get_input_columns(header), selection)))
+  return score_csv_rows(reader, writer, header, selection)
+
+def score_csv_rows(reader, writer, header: list, selection: frozenset or None = None):
+  input_columns = get_input_columns(header)
+  indices = {key: header.index(name) for key, (name, factor) in input_columns.items()}
+  metric_names = scorable_metrics(list(indices), selection)
+  extra_keys = output_keys(metric_names)
+
+  # Takes (line, row) tuples
+  def score_chunk(chunk: list) -> list:
+    columns = {
+      key: [parse_value(key, row[index]) for line, row in chunk]
+      for key, index in indices.items()
+    }
+    convert_columns(columns, input_columns)
+    return score_columns(columns, len(chunk), metric_names)
+
+  n_scored = 0
+  while True:
+    # line_num is the line a row ends on, as quoted fields may span lines
+    chunk = [(reader.line_num, row) for row in islice(reader, chunk_size)]
+    if not chunk:
+      break
+    try:
+      scored = score_chunk(chunk)
+    except row_errors:
+      error = find_row_error(chunk, score_chunk)
+      if error is None:
+        raise
+      raise error from None
+    writer.writerows(
+      row + ['' if scores[key] is None else scores[key] for key in extra_keys]
+      for (line, row), scores in zip(chunk, scored)
+    )
+    n_scored += len(chunk)
+  return n_scored
+
+# Rows are scored by their own inputs, so the output does not depend on how
+# the input is split into chunks.
+def score_jsonl(infile, outfile, selection: frozenset or None = None):
+
+  # Takes (line, row) tuples
+  def score_chunk(chunk: list) -> list:
+    return score_rows([parse_row(row, line) for line, row in chunk], selection)
+
+  n_scored = 0
+  lines = ((number, line) for number, line in enumerate(infile, 1) if line.strip())
+  while True:
+    chunk = [(number, load_json_row(line, number)) for number, line in islice(lines, chunk_size)]
+    if not chunk:
+      break
+    try:
+      scored = score_chunk(chunk)
+    except row_errors:
+      error = find_row_error(chunk, score_chunk)
+      if error is None:
+        raise
+      raise error from None
+    outfile.writelines(
+      json.dumps(row | scores) + '\n'
+      for (line, row), scores in zip(chunk, scored)
+    )
+    n_scored += len(chunk)
+  return n_scored
+
+# Columnar input
+# Columns are sliced into chunks without copying, and only converted to
+# Python numbers by the calculator.
+
+# Returns printable values of a float32 or int8 column, as strings for CSV
+# or as numbers for JSON.
+def format_column(key: str, column, as_text: bool) -> list:
+  if key in integer_keys:
+    return [int(value) for value in column]
+  # float32 has about 7 significant digits
+  values = [f'{value:.7g}' for value in column]
+  if as_text:
+    return values
+  return [float(value) for value in values]
+
+def read_columnar_chunks(reader: ColumnarReader):
+  columns = reader.get_columns()
+  keys = [key for key in input_keys if key in columns]
+  n_rows = reader.get_n_rows()
+  for start in range(0, n_rows, chunk_size):
+    chunk = {key: columns[key][start:start + chunk_size] for key in keys}
+    yield chunk, min(chunk_size, n_rows - start)
+
+def score_columnar(path: str, outfile, output_format: str, selection: frozenset or None = None) -> int:
+  n_scored = 0
+  with ColumnarReader(path) as reader:
+    keys = [key for key in input_keys if key in reader.get_columns()]
+    metric_names = scorable_metrics(keys, selection)
+    extra_keys = output_keys(metric_names)
+    writer = csv.writer(outfile)
+    if output_format == 'csv':
+      writer.writerow(keys + extra_keys)
+    for chunk, n_rows in read_columnar_chunks(reader):
+      scored = score_columns(chunk, n_rows, metric_names)
+      as_text = output_format == 'csv'
+      rows = zip(*[format_column(key, chunk[key], as_text) for key in keys])
+      if as_text:
+        writer.writerows(
+          list(row) + ['' if scores[key] is None else scores[key] for key in extra_keys]
+          for row, scores in zip(rows, scored)
+        )
+      else:
+        outfile.writelines(
+          json.dumps(dict(zip(keys, row)) | scores) + '\n'
+          for row, scores in zip(rows, scored)
+        )
+      n_scored += n_rows
+      chunk = None
+  return n_scored
+
+# Conversion between formats, without scoring
+def convert_to_columnar(infile, path: str, input_format: str) -> int:
+  if input_format == 'csv':
+    reader = csv.reader(infile)
+    names = next(reader, [])
+    input_columns = get_input_columns(names)
+    indices = {name: names.index(name) for name, factor in input_columns.values()}
+    rows = ({name: row[index] for name, index in indices.items()} for row in reader)
+  else:
+    rows = (json.loads(line) for line in infile if line.strip())
+    first_row = next(rows, None)
+    if first_row is None:
+      input_columns = {}
+    else:
+      input_columns = get_input_columns(first_row)
+      rows = chain([first_row], rows)
+  n_converted = 0
+  keys = list(input_columns)
+  with ColumnarWriter(path, keys) as writer:
+    while True:
+      chunk = [parse_row(row) for row in islice(rows, chunk_size)]
+      if not chunk:
+        break
+      try:
+        writer.append({key: [row[key] for row in chunk] for key in keys})
+      except KeyError as e:
+        raise ValueError(f'Every row needs the inputs of the first one, {e} is missing')
+      n_converted += len(chunk)
+  return n_converted
+
+def convert_from_columnar(path: str, outfile, output_format: str) -> int:
+  n_converted = 0
+  with ColumnarReader(path) as reader:
+    keys = [key for key in input_keys if key in reader.get_columns()]
+    writer = csv.writer(outfile)
+    if output_format == 'csv':
+      writer.writerow(keys)
+    for chunk, n_rows in read_columnar_chunks(reader):
+      as_text = output_format == 'csv'
+      rows = zip(*[format_column(key, chunk[key], as_text) for key in keys])
+      if as_text:
+        writer.writerows(rows)
+      else:
+        outfile.writelines(json.dumps(dict(zip(keys, row))) + '\n' for row in rows)
+      n_converted += n_rows
+      chunk = None
+  return n_converted
+
+# Parallel scoring.
+# The input file is split into byte ranges at line boundaries, which are
+# scored by worker processes that each map the file into memory, so rows are
+# never pickled. Quoted CSV fields spanning several lines are not supported.
+
+# Returns the (start, end) byte ranges of the shards.
+def split_lines(mapped: mmap.mmap, start: int, n_shards: int) -> list:
+  size = len(mapped)
+  shard_size = max((size - start) // n_shards, 1)
+  ranges = []
+  while start < size:
+    end = start + shard_size
+    if end >= size or len(ranges) == n_shards - 1:
+      end = size
+    else:
+      newline = mapped.find(b'\n', end)
+      end = size if newline == -1 else newline + 1
+    ranges.append((start, end))
+    start = end
+  return ranges
+
+# Returns the number of lines before `end`, without copying the whole map.
+def count_lines(mapped: mmap.mmap, end: int) -> int:
+  return sum(
+    mapped[start:min(start + buffer_size, end)].count(b'\n')
+    for start in range(0, end, buffer_size)
+  )
+
+def read_lines(mapped: mmap.mmap, start: int, end: int):
+  mapped.seek(start)
+  while mapped.tell() < end:
+    yield mapped.readline().decode()
+
+# Runs in a worker process, writes the scored shard to `output_path`.
+def score_shard(
+  path: str, start: int, end: int, input_format: str, header: list, output_path: str,
+  selection: frozenset or None,
+) -> int:
+  with open(path, 'rb') as infile, open(output_path, 'w', buffering=buffer_size, newline='') as outfile:
+    with mmap.mmap(infile.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+      lines = read_lines(mapped, start, end)
+      try:
+        if input_format == 'csv':
+          return score_csv_rows(csv.reader(lines), csv.writer(outfile), header, selection)
+        return score_jsonl(lines, outfile, selection)
+      except RowError as e:
+        # Lines were counted from the start of the shard
+        raise RowError(e.line + count_lines(mapped, start), e.reason) from None
+
+def score_parallel(
+  path: str, outfile, input_format: str, n_workers: int, selection: frozenset or None = None,
+) -> int:
+  with open(path, 'rb') as infile:
+    if os.fstat(infile.fileno()).st_size == 0:
+      return 0
+    with mmap.mmap(infile.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+      start = 0
+      header = None
+      if input_format == 'csv':
+        header_line = mapped.readline()
+        header = next(csv.reader([header_line.decode()]))
+        start = len(header_line)
+      ranges = split_lines(mapped, start, n_workers)
+  if header is not None:
+    csv.writer(outfile).writerow(header + output_keys(scorable_metrics(get_input_columns(header), selection)))
+  with tempfile.TemporaryDirectory(prefix='bmi-') as temp_dir:
+    output_paths = [os.path.join(temp_dir, f'{i}.part') for i in range(len(ranges))]
+    # Forked workers inherit the installed gettext and the module path
+    context = multiprocessing.get_context('fork')
+    with ProcessPoolExecutor(n_workers, mp_context=context) as executor:
+      futures = [
+        executor.submit(score_shard, path, start, end, input_format, header, output_path, selection)
+        for (start, end), output_path in zip(ranges, output_paths)
+      ]
+      n_scored = sum(future.result() for future in futures)
+    for output_path in output_paths:
+      with open(output_path, 'r', buffering=buffer_size, newline='') as part:
+        shutil.copyfileobj(part, outfile, buffer_size)
+  return n_scored
+
+# Entry point
+def main(argv: list) -> int:
+  parser = argparse.ArgumentParser(
+    prog = 'bmi --batch',
+    description = 'Scores CSV, JSONL or columnar (.bmic) rows without opening a window.',
+  )
+  parser.add_argument('--batch', action='store_true', help=argparse.SUPPRESS)
+  parser.add_argument('input', nargs='?', help='input file, stdin if omitted or -')
+  parser.add_argument('-o', '--output', help='output file, stdout if omitted or -')
+  parser.add_argument('-f', '--format', choices=formats, help='input format')
+  parser.add_argument('-t', '--to', choices=formats, help='output format')
+  parser.add_argument('-j', '--workers', type=int, default=1, help='worker processes, needs an input file')
+  parser.add_argument('--convert', action='store_true', help='convert the inputs to another format without scoring, columnar files only keep the input columns')
+  parser.add_argument('-m', '--metrics', help='comma-separated metrics to score, all if omitted')
+  args = parser.parse_args(argv)
+  selection = None
+  if args.metrics is not None:
+    try:
+      selection = frozenset(metrics.parse_metric_names(args.metrics))
+    except ValueError as e:
+      parser.error(str(e))
+  input_format = args.format or guess_format(args.input)
+  output_format = args.to or (guess_format(args.output) if args.output else None)
+  if output_format is None:
+    output_format = 'csv' if input_format == 'bmic' else input_format
+  has_input_file = args.input not in (None, '-')
+  if args.workers > 1 and not has_input_file:
+    parser.error('--workers needs an input file')
+  if input_format == 'bmic' and not has_input_file:
+    parser.error('columnar input needs an input file')
+  if output_format == 'bmic' and not args.convert:
+    parser.error('scores can not be written in the columnar format')
+  if output_format == 'bmic' and args.output in (None, '-'):
+    parser.error('columnar output needs an output file')
+  if args.convert and (input_format == 'bmic') == (output_format == 'bmic'):
+    parser.error('--convert converts to or from the columnar format')
+  if not args.convert and input_format != 'bmic' and input_format != output_format:
+    parser.error('scored CSV and JSONL are written in their input format')
+  try:
+    if args.convert and output_format == 'bmic':
+      with open_input(args.input) as infile:
+        convert_to_columnar(infile, args.output, input_format)
+    elif args.convert:
+      with open_output(args.output) as outfile:
+        convert_from_columnar(args.input, outfile, output_format)
+    elif input_format == 'bmic':
+      with open_output(args.output) as outfile:
+        score_columnar(args.input, outfile, output_format, selection)
+    elif args.workers > 1:
+      with open_output(args.output) as outfile:
+        score_parallel(args.input, outfile, input_format, args.workers, selection)
+    else:
+      score = {'csv': score_csv, 'jsonl': score_jsonl}.get(input_format)
+      with open_input(args.input) as infile, open_output(args.output) as outfile:
+        score(infile, outfile, selection)
+  except BrokenPipeError:
+    return 0
+  except (OSError, ValueError, IndexError, KeyError, ArithmeticError) as e:
+    print(f'Error scoring input: {e}', file=sys.stderr)
+    return 1
+  return 0
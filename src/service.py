@@ -0,0 +1,277 @@
+# Scoring service.
+# Exposes the calculator over D-Bus, on the application's object path, and
+# over a local Unix socket speaking newline-delimited JSON:
+#   {"id": 1, "method": "Score", "params": {"height": 175, "mass": 65}}
+#   {"id": 1, "result": {"bmi": 21.2, "bmi_category": "Healthy"}}
+# Requests received in the same main loop iteration are scored together in
+# one batch call per set of inputs.
+
+# Imports
+from gi.repository import GLib, Gio
+import os, json, time
+
+# Internal imports
+from . import scorer, timings
+from .histogram import Histogram
+
+# Variables
+# Errors of scoring rows that parse_row() accepted, such as overflowing values
+scoring_errors = (ArithmeticError, ValueError, TypeError)
+interface_name = 'io.github.philippkosarev.bmi.Scorer'
+interface_xml = f'''
+<node>
+  <interface name="{interface_name}">
+    <method name="Score">
+      <arg name="inputs" type="a{{sd}}" direction="in"/>
+      <arg name="scores" type="a{{sv}}" direction="out"/>
+    </method>
+    <method name="ScoreMany">
+      <arg name="inputs" type="aa{{sd}}" direction="in"/>
+      <arg name="scores" type="aa{{sv}}" direction="out"/>
+    </method>
+    <method name="GetStats">
+      <arg name="stats" type="s" direction="out"/>
+    </method>
+    <method name="DumpStats">
+      <arg name="stats" type="s" direction="out"/>
+    </method>
+  </interface>
+</node>
+'''
+
+# Helper functions
+def get_socket_path() -> str:
+  return os.path.join(GLib.get_user_runtime_dir(), 'bmi', 'scorer.sock')
+
+def scores_to_variant(scores: dict) -> dict:
+  variant = {}
+  for key, value in scores.items():
+    if value is None:
+      continue
+    if isinstance(value, str):
+      variant[key] = GLib.Variant('s', value)
+    else:
+      variant[key] = GLib.Variant('d', value)
+  return variant
+
+# Scores the rows of queued requests in one batch, returns their results
+# per request.
+def score_requests(requests: list) -> list:
+  rows = [row for method, start, request_rows, *callbacks in requests for row in request_rows]
+  results = scorer.score_rows(rows)
+  per_request = []
+  offset = 0
+  for method, start, request_rows, *callbacks in requests:
+    per_request.append(results[offset:offset + len(request_rows)])
+    offset += len(request_rows)
+  return per_request
+
+class ScoringService:
+
+  def __init__(self):
+    self.pending = []
+    self.flush_id = None
+    self.histograms = {}
+    self.registrations = {}
+    self.socket_service = None
+    self.connections = set()
+
+  # Queues rows to be scored, then calls `callback` with their scores, or
+  # `error_callback` with a message if they can not be scored.
+  # Raises ValueError right away if a row is invalid.
+  def submit(self, method: str, rows: list, callback, error_callback):
+    rows = [scorer.parse_row(row) for row in rows]
+    self.pending.append((method, time.perf_counter(), rows, callback, error_callback))
+    if self.flush_id is None:
+      # Idle priority runs after pending I/O, so concurrent requests coalesce
+      self.flush_id = GLib.idle_add(self.flush)
+
+  def flush(self) -> bool:
+    self.flush_id = None
+    pending, self.pending = self.pending, []
+    try:
+      replies = list(zip(pending, score_requests(pending)))
+    except scoring_errors:
+      # Scored one by one, so that only the requests that fail get an error
+      replies = []
+      for request in pending:
+        try:
+          replies += [(request, score_requests([request])[0])]
+        except scoring_errors as e:
+          replies += [(request, e)]
+    for (method, start, rows, callback, error_callback), results in replies:
+      if isinstance(results, Exception):
+        error_callback(f'Could not score: {results}')
+      else:
+        callback(results)
+      self.get_histogram(method).record(time.perf_counter() - start)
+    return GLib.SOURCE_REMOVE
+
+  def get_histogram(self, method: str) -> Histogram:
+    histogram = self.histograms.get(method)
+    if histogram is None:
+      histogram = Histogram()
+      self.histograms[method] = histogram
+    return histogram
+
+  # Returns the latency summary of every method.
+  def get_stats(self) -> dict:
+    return {method: histogram.to_dict() for method, histogram in self.histograms.items()}
+
+  # D-Bus
+  def register(self, connection: Gio.DBusConnection, object_path: str):
+    node_info = Gio.DBusNodeInfo.new_for_xml(interface_xml)
+    registration_id = connection.register_object(
+      object_path, node_info.interfaces[0], self.on_method_call, None, None,
+    )
+    self.registrations[connection] = registration_id
+
+  def unregister(self, connection: Gio.DBusConnection):
+    registration_id = self.registrations.pop(connection, None)
+    if registration_id is not None:
+      connection.unregister_object(registration_id)
+
+  def on_method_call(
+    self, connection, sender, object_path, interface, method, parameters, invocation,
+  ):
+    if method == 'GetStats':
+      stats = json.dumps(self.get_stats())
+      invocation.return_value(GLib.Variant('(s)', (stats,)))
+      return
+    if method == 'DumpStats':
+      # Prints the window's timings, and returns them with the service's
+      timings.dump()
+      stats = json.dumps({'timings': timings.get_stats(), 'service': self.get_stats()})
+      invocation.return_value(GLib.Variant('(s)', (stats,)))
+      return
+    if method == 'Score':
+      rows = [parameters.unpack()[0]]
+      def reply(results):
+        scores = scores_to_variant(results[0])
+        invocation.return_value(GLib.Variant('(a{sv})', (scores,)))
+    else:
+      rows = parameters.unpack()[0]
+      def reply(results):
+        scores = [scores_to_variant(result) for result in results]
+        invocation.return_value(GLib.Variant('(aa{sv})', (scores,)))
+    def reply_error(message):
+      invocation.return_dbus_error(f'{interface_name}.ScoringFailed', message)
+    try:
+      self.submit(method, rows, reply, reply_error)
+    except ValueError as e:
+      invocation.return_dbus_error(f'{interface_name}.InvalidInput', str(e))
+
+  # Unix socket
+  def listen(self, path: str or None = None):
+    path = path or get_socket_path()
+    os.makedirs(os.path.dirname(path), mode=0o700, exist_ok=True)
+    if os.path.exists(path):
+      os.unlink(path)
+    self.socket_service = Gio.SocketService()
+    self.socket_service.add_address(
+      Gio.UnixSocketAddress.new(path),
+      Gio.SocketType.STREAM,
+      Gio.SocketProtocol.DEFAULT,
+      None,
+    )
+    self.socket_service.connect('incoming', self.on_incoming)
+    self.socket_service.start()
+
+  def stop(self):
+    if self.socket_service is not None:
+      self.socket_service.stop()
+      self.socket_service.close()
+      self.socket_service = None
+    for connection in list(self.connections):
+      connection.close()
+
+  def on_incoming(self, socket_service, connection, source_object) -> bool:
+    self.connections.add(SocketConnection(self, connection))
+    return True
+
+# A client of the Unix socket. Requests are read line by line, replies are
+# queued and written in order without blocking the main loop.
+class SocketConnection:
+
+  def __init__(self, service: ScoringService, connection: Gio.SocketConnection):
+    self.service = service
+    self.connection = connection
+    self.input = Gio.DataInputStream.new(connection.get_input_stream())
+    self.output = connection.get_output_stream()
+    self.write_queue = []
+    self.writing = False
+    self.closed = False
+    self.read_next()
+
+  def read_next(self):
+    self.input.read_line_async(GLib.PRIORITY_DEFAULT, None, self.on_line_read)
+
+  def on_line_read(self, stream, result):
+    try:
+      line, length = stream.read_line_finish_utf8(result)
+    except GLib.Error:
+      line = None
+    if line is None:
+      self.close()
+      return
+    if line.strip():
+      self.handle(line)
+    self.read_next()
+
+  def handle(self, line: str):
+    request_id = None
+    try:
+      request = json.loads(line)
+      request_id = request.get('id')
+      method = request.get('method')
+      params = request.get('params')
+      if method == 'Stats':
+        self.send({'id': request_id, 'result': self.service.get_stats()})
+        return
+      if method == 'Score':
+        rows = [params]
+        reply = lambda results: self.send({'id': request_id, 'result': results[0]})
+      elif method == 'ScoreMany':
+        rows = list(params)
+        reply = lambda results: self.send({'id': request_id, 'result': results})
+      else:
+        raise ValueError(f'Unknown method {method!r}')
+      reply_error = lambda message: self.send({'id': request_id, 'error': message})
+      self.service.submit(method, rows, reply, reply_error)
+    except (ValueError, TypeError, AttributeError) as e:
+      self.send({'id': request_id, 'error': str(e)})
+
+  def send(self, message: dict):
+    if self.closed:
+      return
+    self.write_queue.append((json.dumps(message) + '\n').encode())
+    if not self.writing:
+      self.write_next()
+
+  def write_next(self):
+    if not self.write_queue:
+      self.writing = False
+      return
+    self.writing = True
+    data = b''.join(self.write_queue)
+    self.write_queue.clear()
+    self.output.write_bytes_async(
+      GLib.Bytes.new(data), GLib.PRIORITY_DEFAULT, None, self.on_written, data,
+    )
+
+  def on_written(self, stream, result, data: bytes):
+    try:
+      n_written = stream.write_bytes_finish(result)
+    except GLib.Error:
+      self.close()
+      return
+    if n_written < len(data):
+      self.write_queue.insert(0, data[n_written:])
+    self.write_next()
+
+  def close(self):
+    if self.closed:
+      return
+    self.closed = True
+    self.connection.close(None)
+    self.service.connections.discard(self)
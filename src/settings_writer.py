@@ -0,0 +1,76 @@
+# Imports
+from gi.repository import GLib, Gio
+
+# Write-behind layer for frequently changing settings keys.
+# Values are kept in memory and written after `delay` milliseconds without
+# further changes, only for keys whose stored value actually differs. All
+# keys of one flush are applied as a single transaction.
+class SettingsWriter:
+
+  def __init__(self, settings: Gio.Settings, delay: int = 500):
+    # A separate instance, so that delay-apply mode does not affect other
+    # users of the application's settings.
+    self.settings = Gio.Settings.new(settings.get_property('schema-id'))
+    self.settings.delay()
+    self.delay = delay
+    self.pending = {}
+    self.timeout_id = None
+    self.n_writes = 0
+    self.flush_callback = None
+
+  def set_delay(self, delay: int):
+    self.delay = delay
+
+  def get_delay(self) -> int:
+    return self.delay
+
+  # Sets a function called without arguments after pending changes were
+  # flushed, that is once they have settled.
+  def set_flush_callback(self, callback):
+    self.flush_callback = callback
+
+  # Returns how many keys have been written since creation.
+  def get_n_writes(self) -> int:
+    return self.n_writes
+
+  # Schedules a key to be set, the value None resets the key instead.
+  def set(self, key: str, value):
+    self.pending[key] = value
+    self.schedule()
+
+  def reset(self, key: str):
+    self.set(key, None)
+
+  def schedule(self):
+    if self.timeout_id is not None:
+      GLib.source_remove(self.timeout_id)
+    self.timeout_id = GLib.timeout_add(self.delay, self.on_timeout)
+
+  def on_timeout(self) -> bool:
+    self.timeout_id = None
+    self.flush()
+    return GLib.SOURCE_REMOVE
+
+  # Writes all pending changes now.
+  def flush(self):
+    if self.timeout_id is not None:
+      GLib.source_remove(self.timeout_id)
+      self.timeout_id = None
+    if not self.pending:
+      return
+    settings = self.settings
+    for key, value in self.pending.items():
+      if value is None:
+        if settings.get_user_value(key) is None:
+          continue
+        settings.reset(key)
+      elif settings[key] == value:
+        continue
+      else:
+        settings[key] = value
+      self.n_writes += 1
+    self.pending.clear()
+    if settings.get_has_unapplied():
+      settings.apply()
+    if self.flush_callback is not None:
+      self.flush_callback()
@@ -0,0 +1,59 @@
+# Startup profiler, enabled by the --startup-profile flag.
+# Stages are marked in the order they happen, and the report shows how long
+# each one took, measured from process start to the first painted frame.
+
+# Imports
+import sys, os, time
+
+# Variables
+enabled = False
+marks = []
+import_time = time.perf_counter()
+
+# Helper functions
+
+# Returns seconds since the process started, or since this module was
+# imported where /proc is not available.
+def get_process_time() -> float:
+  try:
+    with open('/proc/self/stat') as stat:
+      fields = stat.read().rsplit(')', 1)[1].split()
+    # Field 22 (starttime) is the 20th after the command name and state
+    start_time = int(fields[19]) / os.sysconf('SC_CLK_TCK')
+    return time.clock_gettime(time.CLOCK_BOOTTIME) - start_time
+  except (OSError, ValueError, IndexError, AttributeError):
+    return time.perf_counter() - import_time
+
+
+# Functions
+def enable():
+  global enabled
+  enabled = True
+  mark('interpreter')
+
+# Records the end of a stage.
+def mark(stage: str):
+  if not enabled:
+    return
+  marks.append((stage, get_process_time()))
+
+# Marks the first frame painted by a realized widget, then prints the report.
+def watch_first_frame(widget):
+  if not enabled:
+    return
+  frame_clock = widget.get_frame_clock()
+  def on_after_paint(frame_clock):
+    global enabled
+    frame_clock.disconnect(handler_id)
+    mark('first frame')
+    report()
+    enabled = False
+  handler_id = frame_clock.connect('after-paint', on_after_paint)
+
+def report(file = sys.stderr):
+  print('Startup profile:', file=file)
+  previous = 0
+  for stage, elapsed in marks:
+    print(f'  {stage:<24} {(elapsed - previous) * 1000:8.1f} ms', file=file)
+    previous = elapsed
+  print(f'  {"total":<24} {previous * 1000:8.1f} ms', file=file)
@@ -0,0 +1,177 @@
+# What-if sweeps: a metric scored over a Cartesian grid of inputs.
+# Each axis sweeps one input over a list of values, the other inputs are
+# fixed. The whole grid goes through Calculator.batch() in one call, and
+# results are cached per metric, axes and fixed inputs.
+#   result = sweep('whtr', [make_axis('waist', 60, 120, 61)], {'height': 175})
+
+# Imports
+import csv, math, functools
+from array import array
+from itertools import product
+from dataclasses import dataclass
+
+# Internal imports
+from . import metrics
+from .calculator import as_inputs, get_numpy, is_array
+
+# Shorthand vars
+calc = metrics.calc
+
+# Variables
+cache_size = 32
+# what_if() sweeps inputs this far either way of their current value
+sweep_span = 30
+n_sweep_points = 61
+
+# Helper functions
+
+# An input swept over a list of values.
+@dataclass(slots=True, frozen=True)
+class Axis:
+  key: str
+  values: tuple
+
+  def __len__(self):
+    return len(self.values)
+
+# Returns an axis of `n` evenly spaced values from `start` to `stop`.
+def make_axis(key: str, start: float, stop: float, n: int) -> Axis:
+  if n < 2:
+    return Axis(key, (start,))
+  step = (stop - start) / (n - 1)
+  return Axis(key, tuple(start + step * i for i in range(n)))
+
+# Results derived from the batch results and the grid's columns, by name
+def target_weight(columns: dict, results: dict):
+  height = columns.get('height')
+  bmi = columns.get('bmi')
+  if is_array(height):
+    return bmi * ((height / 100) ** 2)
+  return array('d', [b * ((h / 100) * (h / 100)) for h, b in zip(height, bmi)])
+
+derived_metrics = {
+  # The weight at which the height gives a BMI, see bmi_and_height_to_weight
+  'target_weight': target_weight,
+}
+derived_inputs = {
+  'target_weight': frozenset(['height', 'bmi']),
+}
+
+# Returns the inputs, or other axes, that a metric reads.
+def get_metric_inputs(metric: str) -> frozenset:
+  if metric in derived_inputs:
+    return derived_inputs.get(metric)
+  if metric in metrics.registry:
+    return metrics.get_metric(metric).function.inputs
+  return frozenset()
+
+# Returns the grid's columns, the first axis varying slowest.
+def grid_columns(axes: tuple, fixed: tuple) -> dict:
+  n_points = math.prod(len(axis) for axis in axes)
+  numpy = get_numpy()
+  if numpy is not None:
+    grids = numpy.meshgrid(*[numpy.asarray(axis.values) for axis in axes], indexing='ij')
+    columns = {axis.key: grid.ravel() for axis, grid in zip(axes, grids)}
+    for key, value in fixed:
+      columns[key] = numpy.full(n_points, value, dtype=numpy.float64)
+    return columns
+  points = list(zip(*product(*[axis.values for axis in axes])))
+  columns = {axis.key: array('d', values) for axis, values in zip(axes, points)}
+  for key, value in fixed:
+    columns[key] = array('d', [value]) * n_points
+  return columns
+
+class SweepResult:
+
+  def __init__(self, metric: str, axes: tuple, values):
+    self.metric = metric
+    self.axes = axes
+    self.values = values
+
+  def get_metric(self) -> str:
+    return self.metric
+
+  def get_axes(self) -> tuple:
+    return self.axes
+
+  def get_shape(self) -> tuple:
+    return tuple(len(axis) for axis in self.axes)
+
+  # Returns the flat values, the last axis varying fastest.
+  def get_values(self):
+    return self.values
+
+  # Returns a line over the first axis per point of the other axes, as
+  # (point, values) tuples, where point holds the other axes' values.
+  def get_lines(self) -> list:
+    first, *others = self.axes
+    n_lines = math.prod(len(axis) for axis in others)
+    values = [float(value) for value in self.values]
+    lines = []
+    for i, point in enumerate(product(*[axis.values for axis in others])):
+      lines.append((point, values[i::n_lines]))
+    return lines
+
+  # Writes the grid as CSV, a column per axis and one for the metric.
+  def to_csv(self, file):
+    writer = csv.writer(file)
+    writer.writerow([axis.key for axis in self.axes] + [self.metric])
+    points = product(*[axis.values for axis in self.axes])
+    writer.writerows(
+      list(point) + ['' if math.isnan(value) else value]
+      for point, value in zip(points, map(float, self.values))
+    )
+
+@functools.lru_cache(maxsize=cache_size)
+def cached_sweep(metric: str, axes: tuple, fixed: tuple) -> SweepResult:
+  columns = grid_columns(axes, fixed)
+  missing = get_metric_inputs(metric) - columns.keys()
+  if missing or (metric not in derived_metrics and metric not in metrics.registry):
+    raise ValueError(f"'{metric}' can not be swept over {', '.join(columns)}")
+  results = calc.batch(columns)
+  if metric in derived_metrics:
+    values = derived_metrics.get(metric)(columns, results)
+  elif metric in results:
+    values = results.get(metric)
+  else:
+    # Metrics that Calculator.batch() does not know
+    values = metrics.get_metric(metric).batch(columns)
+  return SweepResult(metric, axes, values)
+
+# Functions
+
+# Scores `metric` at every point of the axes' grid, with the other inputs
+# taken from `fixed`. Raises ValueError if the inputs do not cover the metric.
+def sweep(metric: str, axes: list, fixed = None) -> SweepResult:
+  # Only the inputs the metric reads are part of the cache key
+  needed = get_metric_inputs(metric) - {axis.key for axis in axes}
+  if fixed is None:
+    fixed = ()
+  else:
+    fixed = tuple(
+      (key, value) for key, value in as_inputs(fixed).items()
+      if key in needed
+    )
+  return cached_sweep(metric, tuple(axes), fixed)
+
+# Returns the sweep shown next to a metric's result: how it changes around
+# the current inputs, as declared by the metric's `sweep`. Raises ValueError
+# if the metric declares none or the inputs do not cover it.
+def what_if(metric: str, inputs) -> SweepResult:
+  inputs = as_inputs(inputs)
+  sweep_info = metrics.get_metric(metric).sweep
+  if sweep_info is None:
+    raise ValueError(f"'{metric}' has no sweep")
+  key = sweep_info.get('input')
+  value = inputs.get(key)
+  if value is None:
+    raise ValueError(f"'{metric}' is swept over '{key}', which is not set")
+  value = round(value)
+  axes = [make_axis(key, max(value - sweep_span, 10), value + sweep_span, n_sweep_points)]
+  lines_function = sweep_info.get('lines')
+  if lines_function is not None:
+    axes.append(Axis(*lines_function(inputs)))
+  return sweep(sweep_info.get('result', metric), axes, inputs)
+
+def clear_cache():
+  cached_sweep.cache_clear()
@@ -0,0 +1,113 @@
+# Imports
+from bisect import bisect_right
+from dataclasses import dataclass, replace
+
+# Variables
+no_label = (None, None)
+# Styles index the style classes of widgets/shared.py
+n_styles = 4
+
+# A threshold of a metric, the value may be a function of the inputs.
+@dataclass(slots=True, frozen=True)
+class Threshold:
+  text: str
+  value: float
+  style: int
+
+  @classmethod
+  def from_dict(cls, threshold: dict):
+    return cls(threshold.get('text'), threshold.get('value'), threshold.get('style'))
+
+  # Dict-style access, for code written for threshold dicts
+  def get(self, key: str, default = None):
+    if key not in ('text', 'value', 'style'):
+      return default
+    return getattr(self, key)
+
+  # Returns a copy with another value.
+  def with_value(self, value: float):
+    return replace(self, value=value)
+
+# Returns a threshold as a Threshold record, converting dicts.
+def as_threshold(threshold) -> Threshold:
+  if type(threshold) is Threshold:
+    return threshold
+  return Threshold.from_dict(threshold)
+
+# A list of thresholds compiled for repeated classification.
+# Static values are sorted once. Callable values (such as
+# Calculator.whtr_unhealthy) are re-evaluated by update(), and have to be
+# declared in ascending order relative to their neighbours, which all
+# thresholds of the calculator are.
+class ThresholdTable:
+
+  def __init__(self, thresholds: list):
+    thresholds = [as_threshold(threshold) for threshold in thresholds]
+    if not any(callable(t.value) for t in thresholds):
+      thresholds = sorted(thresholds, key=lambda t: t.value)
+    self.values = []
+    self.labels = []
+    self.functions = []
+    self.inputs = frozenset()
+    for i, threshold in enumerate(thresholds):
+      value = threshold.value
+      if callable(value):
+        self.functions.append((i, value, value.__name__))
+        self.inputs |= getattr(value, 'inputs', frozenset())
+        value = 0
+      self.values.append(value)
+      self.labels.append((threshold.text, threshold.style))
+
+  # Re-evaluates the callable values for the given inputs.
+  def update(self, inputs):
+    values = self.values
+    for i, function, name in self.functions:
+      values[i] = function(inputs)
+
+  # Same as update(), but takes precalculated values keyed by function name,
+  # like a row of Calculator.batch() results.
+  def update_named(self, named_values: dict):
+    values = self.values
+    for i, function, name in self.functions:
+      values[i] = named_values[name]
+
+  # Same as update_named(), but takes the values in the order of
+  # get_function_names(), which avoids building a dict per batch row.
+  def set_function_values(self, function_values):
+    values = self.values
+    for (i, function, name), value in zip(self.functions, function_values):
+      values[i] = value
+
+  def get_function_names(self) -> list:
+    return [name for i, function, name in self.functions]
+
+  # Returns the (text, style) label of the threshold a result falls into.
+  def lookup(self, result: float or None) -> tuple:
+    # `result != result` is only true for NaN
+    if result is None or result != result:
+      return no_label
+    i = bisect_right(self.values, result) - 1
+    if i < 0:
+      return no_label
+    return self.labels[i]
+
+  def classify(self, result: float or None, inputs) -> tuple:
+    self.update(inputs)
+    return self.lookup(result)
+
+  def has_functions(self) -> bool:
+    return bool(self.functions)
+
+  # Returns the inputs that the callable values read.
+  def get_inputs(self) -> frozenset:
+    return self.inputs
+
+  # Returns the current thresholds as Threshold records.
+  def to_list(self) -> list:
+    return [
+      Threshold(text, value, style)
+      for value, (text, style) in zip(self.values, self.labels)
+    ]
+
+  def __len__(self):
+    return len(self.values)
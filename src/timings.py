@@ -0,0 +1,100 @@
+# Hot-path timings, enabled by the BMI_TIMINGS environment variable or the
+# record-timings setting.
+# Code wraps its stages in `with timings.stage('name'):`, which does nothing
+# while disabled. Every stage keeps a rolling latency histogram, which are
+# dumped on exit and by the scoring service's DumpStats D-Bus method.
+
+# Imports
+import os, sys, time
+from contextlib import nullcontext
+
+# Internal imports
+from .histogram import RollingHistogram
+
+# Variables
+# The environment variable keeps timings on regardless of the setting
+forced = bool(os.environ.get('BMI_TIMINGS'))
+enabled = forced
+histograms = {}
+frame_clocks = {}
+null_stage = nullcontext()
+
+# Helper functions
+class Stage:
+  __slots__ = ('name', 'start')
+
+  def __init__(self, name: str):
+    self.name = name
+
+  def __enter__(self):
+    self.start = time.perf_counter()
+
+  def __exit__(self, *args):
+    record(self.name, time.perf_counter() - self.start)
+
+# Functions
+def set_enabled(enable: bool):
+  global enabled
+  enabled = enable or forced
+  if not enabled:
+    for frame_clock, handler_ids in frame_clocks.items():
+      for handler_id in handler_ids:
+        frame_clock.disconnect(handler_id)
+    frame_clocks.clear()
+
+def is_enabled() -> bool:
+  return enabled
+
+# Returns a context manager that times a stage.
+def stage(name: str):
+  if not enabled:
+    return null_stage
+  return Stage(name)
+
+def record(name: str, seconds: float):
+  histogram = histograms.get(name)
+  if histogram is None:
+    histogram = RollingHistogram()
+    histograms[name] = histogram
+  histogram.record(seconds)
+
+# Times the frames of a realized widget, from before to after painting,
+# which covers the relayout that follows a change.
+def watch_frames(widget):
+  if not enabled:
+    return
+  frame_clock = widget.get_frame_clock()
+  if frame_clock is None or frame_clock in frame_clocks:
+    return
+  start = None
+  def on_before_paint(frame_clock):
+    nonlocal start
+    start = time.perf_counter()
+  def on_after_paint(frame_clock):
+    if start is not None:
+      record('frame', time.perf_counter() - start)
+  frame_clocks[frame_clock] = [
+    frame_clock.connect('before-paint', on_before_paint),
+    frame_clock.connect('after-paint', on_after_paint),
+  ]
+
+# Returns the latency summary of every stage.
+def get_stats() -> dict:
+  return {name: histogram.to_dict() for name, histogram in sorted(histograms.items())}
+
+def reset():
+  histograms.clear()
+
+def dump(file = sys.stderr):
+  stats = get_stats()
+  if not stats:
+    return
+  print('Timings (ms):', file=file)
+  print(f'  {"stage":<32} {"count":>7} {"mean":>8} {"p50":>8} {"p99":>8} {"max":>8}', file=file)
+  for name, summary in stats.items():
+    print(
+      f'  {name:<32} {summary["count"]:>7}'
+      f' {summary["mean_ms"]:8.3f} {summary["p50_ms"]:8.3f}'
+      f' {summary["p99_ms"]:8.3f} {summary["max_ms"]:8.3f}',
+      file=file,
+    )
@@ -0,0 +1,53 @@
+# Unit conversion of single values and of whole columns.
+# Column names may carry a unit suffix, such as mass_lb or height_in, which
+# says how to convert the column to the calculator's centimetres and
+# kilograms. Kept free of GTK, for the widgets and the batch scorer alike.
+
+# Imports
+import sys
+from array import array
+
+# Variables
+lb_per_kg = 2.2046226218
+kg_per_lb = 1 / lb_per_kg
+cm_per_in = 2.54
+in_per_cm = 1 / cm_per_in
+
+# Factors from the units of an input to the calculator's unit
+factors_by_input = {
+  'height': {'cm': 1.0, 'in': cm_per_in},
+  'mass': {'kg': 1.0, 'lb': kg_per_lb},
+  'waist': {'cm': 1.0, 'in': cm_per_in},
+  'hip': {'cm': 1.0, 'in': cm_per_in},
+}
+
+# Conversion functions
+def kg_to_lb(value: float) -> float:
+  return value * lb_per_kg
+
+def lb_to_kg(value: float) -> float:
+  return value * kg_per_lb
+
+def in_to_cm(value: float) -> float:
+  return value * cm_per_in
+
+def cm_to_in(value: float) -> float:
+  return value * in_per_cm
+
+# Multiplies a whole column by a factor, as a NumPy array if it is one and
+# as an array.array otherwise.
+def convert_column(column, factor: float):
+  # NumPy is not imported for this, there are no arrays before it is
+  numpy = sys.modules.get('numpy')
+  if numpy is not None and isinstance(column, numpy.ndarray):
+    return column * factor
+  return array('d', map(float(factor).__mul__, column))
+
+# Returns the input and the factor to its unit of a unit-tagged column name,
+# such as ('mass', kg_per_lb) for 'mass_lb', or None for other names.
+def parse_column_name(name: str) -> tuple or None:
+  key, separator, unit = name.rpartition('_')
+  factor = factors_by_input.get(key, {}).get(unit)
+  if factor is None:
+    return None
+  return key, factor
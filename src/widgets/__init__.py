@@ -8,6 +8,15 @@ from .mass_row import MassRow
 from .time_row import TimeRow
 # Output
 from .result_row import ResultRow
-from .result_dialog import ResultDialog
 # Other
 from .group import Group
+
+# Imported on first use to keep them out of startup
+def __getattr__(name: str):
+  if name == 'ResultDialog':
+    from .result_dialog import ResultDialog
+    return ResultDialog
+  if name == 'ProfilePopover':
+    from .profile_popover import ProfilePopover
+    return ProfilePopover
+  raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,322 @@
+# Imports
+from gi.repository import GLib, Gtk, Gsk, Graphene, Pango
+import math
+
+# Internal imports
+from .shared import *
+from ..thresholds import as_threshold
+from ..downsample import DownsampledLine
+
+# Variables
+margin_start = 44
+margin_end = 8
+margin_top = 8
+margin_bottom = 22
+band_alpha = 0.15
+# Zoom of one scroll step
+scroll_zoom = 1.2
+# Shortest time span a trend chart zooms in to, in seconds
+min_trend_span = 60 * 60
+
+# Helper functions
+def make_rect(x: float, y: float, width: float, height: float) -> Graphene.Rect:
+  return Graphene.Rect().init(x, y, width, height)
+
+def make_point(x: float, y: float) -> Graphene.Point:
+  return Graphene.Point().init(x, y)
+
+def format_tick(value: float) -> str:
+  return str(round(value, 2 if abs(value) < 10 else 0)).removesuffix('.0')
+
+# Returns the lowest and highest of the ranges, padded, or (0, 1) without any.
+def pad_range(ranges: list) -> tuple:
+  ranges = [value_range for value_range in ranges if value_range is not None]
+  if not ranges:
+    return 0.0, 1.0
+  low = min(low for low, high in ranges)
+  high = max(high for low, high in ranges)
+  if low == high:
+    low, high = low - 1, high + 1
+  padding = (high - low) * 0.05
+  return low - padding, high + padding
+
+def get_line_range(values: list) -> tuple or None:
+  values = [value for value in values if not math.isnan(value)]
+  return (min(values), max(values)) if values else None
+
+# Returns the bands between consecutive thresholds, for Chart.set_bands().
+# Takes Threshold records or threshold dicts.
+def thresholds_to_bands(thresholds: list) -> list:
+  thresholds = sorted(map(as_threshold, thresholds), key=lambda x: x.value)
+  ends = [threshold.value for threshold in thresholds[1:]] + [None]
+  return [
+    (threshold.value, end, threshold.style)
+    for threshold, end in zip(thresholds, ends)
+  ]
+
+# A line chart drawn in one snapshot, with horizontal bands behind the lines.
+# Lines are lists of y values over shared x values, NaN values leave gaps.
+# Bands are (start, end, style) tuples, end None meaning unbounded, and are
+# coloured like the `styles` of shared.py.
+class Chart(Gtk.Widget):
+  __gtype_name__ = 'Chart'
+
+  def __init__(self, **kwargs):
+    super().__init__(**kwargs)
+    self.set_size_request(-1, 180)
+    self.x_values = []
+    self.lines = []
+    self.bands = []
+    self.marker = None
+    self.y_range = (0.0, 1.0)
+    # Unshown labels with the style classes, to get their colours from CSS
+    self.swatches = []
+    for style in styles:
+      swatch = Gtk.Label(css_classes=[style])
+      swatch.set_parent(self)
+      swatch.set_child_visible(False)
+      self.swatches.append(swatch)
+
+  def do_dispose(self):
+    for swatch in self.swatches:
+      swatch.unparent()
+    self.swatches = []
+    Gtk.Widget.do_dispose(self)
+
+  # Takes the x values and a list of (values, style) lines, style None
+  # drawing a line in the foreground colour.
+  def set_lines(self, x_values: list, lines: list):
+    self.x_values = list(x_values)
+    self.lines = lines
+    self.y_range = pad_range([get_line_range(line) for line, style in lines])
+    self.queue_draw()
+
+  def set_bands(self, bands: list):
+    self.bands = bands
+    self.queue_draw()
+
+  # Draws a vertical line at an x value, such as the current input.
+  def set_marker(self, x_value: float or None):
+    self.marker = x_value
+    self.queue_draw()
+
+  def get_style_color(self, style: int or None):
+    if style is None:
+      return self.get_color()
+    return self.swatches[style].get_color()
+
+  # Returns the shown x values' range, or None if there is nothing to show.
+  def get_x_range(self) -> tuple or None:
+    if len(self.x_values) < 2:
+      return None
+    return self.x_values[0], self.x_values[-1]
+
+  # Returns the lines to draw as (x values, y values, style) tuples, for a
+  # range of x values that is `width` pixels wide.
+  def get_visible_lines(self, x_low: float, x_high: float, width: int) -> list:
+    return [(self.x_values, line, style) for line, style in self.lines]
+
+  def format_x(self, value: float) -> str:
+    return format_tick(value)
+
+  def get_plot_size(self) -> tuple:
+    width = self.get_width() - margin_start - margin_end
+    height = self.get_height() - margin_top - margin_bottom
+    return width, height
+
+  def do_snapshot(self, snapshot: Gtk.Snapshot):
+    x_range = self.get_x_range()
+    if x_range is None:
+      return
+    width, height = self.get_plot_size()
+    if width <= 0 or height <= 0:
+      return
+    x_low, x_high = x_range
+    y_low, y_high = self.y_range
+    to_x = lambda x: margin_start + (x - x_low) / (x_high - x_low) * width
+    to_y = lambda y: margin_top + (y_high - y) / (y_high - y_low) * height
+    self.snapshot_bands(snapshot, to_y, y_low, y_high, width)
+    foreground = self.get_color()
+    # Axes
+    builder = Gsk.PathBuilder.new()
+    builder.move_to(margin_start, margin_top)
+    builder.line_to(margin_start, margin_top + height)
+    builder.line_to(margin_start + width, margin_top + height)
+    axis_color = foreground.copy()
+    axis_color.alpha *= 0.4
+    snapshot.append_stroke(builder.to_path(), Gsk.Stroke.new(1), axis_color)
+    if self.marker is not None and x_low <= self.marker <= x_high:
+      builder = Gsk.PathBuilder.new()
+      builder.move_to(to_x(self.marker), margin_top)
+      builder.line_to(to_x(self.marker), margin_top + height)
+      snapshot.append_stroke(builder.to_path(), Gsk.Stroke.new(1), axis_color)
+    # Lines, each one path, clipped as they may run past the range
+    stroke = Gsk.Stroke.new(2)
+    stroke.set_line_join(Gsk.LineJoin.ROUND)
+    snapshot.push_clip(make_rect(margin_start, margin_top, width, height))
+    for x_values, line, style in self.get_visible_lines(x_low, x_high, width):
+      builder = Gsk.PathBuilder.new()
+      drawing = False
+      for x, y in zip(x_values, line):
+        if math.isnan(y):
+          drawing = False
+        elif drawing:
+          builder.line_to(to_x(x), to_y(y))
+        else:
+          builder.move_to(to_x(x), to_y(y))
+          drawing = True
+      snapshot.append_stroke(builder.to_path(), stroke, self.get_style_color(style))
+    snapshot.pop()
+    # Tick labels of the ranges
+    self.snapshot_label(snapshot, format_tick(y_high), 0, margin_top, foreground)
+    self.snapshot_label(snapshot, format_tick(y_low), 0, margin_top + height - 14, foreground)
+    self.snapshot_label(snapshot, self.format_x(x_low), margin_start, margin_top + height + 4, foreground)
+    self.snapshot_label(
+      snapshot, self.format_x(x_high), margin_start + width, margin_top + height + 4,
+      foreground, Pango.Alignment.RIGHT,
+    )
+
+  def snapshot_bands(self, snapshot: Gtk.Snapshot, to_y, y_low: float, y_high: float, width: float):
+    for start, end, style in self.bands:
+      if end is None:
+        end = y_high
+      start = max(start, y_low)
+      end = min(end, y_high)
+      if start >= end:
+        continue
+      color = self.get_style_color(style).copy()
+      color.alpha = band_alpha
+      top = to_y(end)
+      snapshot.append_color(color, make_rect(margin_start, top, width, to_y(start) - top))
+
+  def snapshot_label(
+    self, snapshot: Gtk.Snapshot, text: str, x: float, y: float, color,
+    alignment: Pango.Alignment = Pango.Alignment.LEFT,
+  ):
+    layout = self.create_pango_layout(text)
+    layout.set_font_description(Pango.FontDescription.from_string('9'))
+    if alignment == Pango.Alignment.RIGHT:
+      x -= layout.get_pixel_size()[0]
+    snapshot.save()
+    snapshot.translate(make_point(x, y))
+    snapshot.append_layout(layout, color)
+    snapshot.restore()
+
+# A Chart of lines over time, in seconds since the epoch, that is panned by
+# dragging and zoomed by scrolling or pinching. However long the lines are,
+# each frame only draws about as many points as the chart is wide, see
+# downsample.py.
+class TrendChart(Chart):
+  __gtype_name__ = 'TrendChart'
+
+  def __init__(self, **kwargs):
+    super().__init__(**kwargs)
+    self.trend_lines = []
+    self.data_range = None
+    self.view = None
+    self.view_at_start = None
+    self.pointer_x = None
+    # The last downsampled lines and what they were downsampled for
+    self.visible_lines = []
+    self.visible_key = None
+    drag = Gtk.GestureDrag()
+    drag.connect('drag-begin', self.on_gesture_begin)
+    drag.connect('drag-update', self.on_drag_update)
+    self.add_controller(drag)
+    zoom = Gtk.GestureZoom()
+    zoom.connect('begin', self.on_gesture_begin)
+    zoom.connect('scale-changed', self.on_zoom_scale_changed)
+    zoom.group(drag)
+    self.add_controller(zoom)
+    scroll = Gtk.EventControllerScroll(flags=Gtk.EventControllerScrollFlags.VERTICAL)
+    scroll.connect('scroll', self.on_scroll)
+    self.add_controller(scroll)
+    motion = Gtk.EventControllerMotion()
+    motion.connect('motion', self.on_motion)
+    self.add_controller(motion)
+
+  # Takes the times and a list of (values, style) lines, NaN values being
+  # left out. Shows the whole time range.
+  def set_lines(self, x_values, lines: list):
+    self.trend_lines = [(DownsampledLine(x_values, line), style) for line, style in lines]
+    x_ranges = [line.get_x_range() for line, style in self.trend_lines]
+    x_ranges = [x_range for x_range in x_ranges if x_range is not None]
+    if x_ranges:
+      self.data_range = (min(low for low, high in x_ranges), max(high for low, high in x_ranges))
+    else:
+      self.data_range = None
+    self.view = self.data_range
+    self.y_range = pad_range([line.get_y_range() for line, style in self.trend_lines])
+    self.visible_key = None
+    self.queue_draw()
+
+  # Returns how many points the longest line has.
+  def get_n_points(self) -> int:
+    return max((line.get_n_points() for line, style in self.trend_lines), default=0)
+
+  def get_x_range(self) -> tuple or None:
+    if self.view is None or self.view[0] == self.view[1]:
+      return None
+    return self.view
+
+  def get_visible_lines(self, x_low: float, x_high: float, width: int) -> list:
+    key = (x_low, x_high, width)
+    if key != self.visible_key:
+      self.visible_lines = [
+        (*line.get_range(x_low, x_high, max(width, 3)), style)
+        for line, style in self.trend_lines
+      ]
+      self.visible_key = key
+    return self.visible_lines
+
+  def format_x(self, value: float) -> str:
+    date_time = GLib.DateTime.new_from_unix_local(int(value))
+    if self.view[1] - self.view[0] < 2 * 24 * 60 * 60:
+      return date_time.format('%X')
+    return date_time.format('%x')
+
+  # Shows `span` seconds around `center`, kept within the data's range.
+  def set_view(self, center: float, span: float):
+    data_low, data_high = self.data_range
+    span = min(max(span, min_trend_span), data_high - data_low)
+    low = min(max(center - span / 2, data_low), data_high - span)
+    view = (low, low + span)
+    if view != self.view:
+      self.view = view
+      self.queue_draw()
+
+  # Zooms by `factor`, keeping the time under `x` in place.
+  def zoom(self, view: tuple, factor: float, x: float):
+    low, high = view
+    width = max(self.get_plot_size()[0], 1)
+    fraction = min(max((x - margin_start) / width, 0), 1)
+    anchor = low + fraction * (high - low)
+    span = (high - low) / factor
+    self.set_view(anchor + (0.5 - fraction) * span, span)
+
+  def on_gesture_begin(self, gesture: Gtk.Gesture, *args):
+    self.view_at_start = self.view
+
+  def on_drag_update(self, gesture: Gtk.GestureDrag, offset_x: float, offset_y: float):
+    if self.view_at_start is None:
+      return
+    low, high = self.view_at_start
+    width = max(self.get_plot_size()[0], 1)
+    shift = offset_x / width * (high - low)
+    self.set_view((low + high) / 2 - shift, high - low)
+
+  def on_zoom_scale_changed(self, gesture: Gtk.GestureZoom, scale: float):
+    if self.view_at_start is None:
+      return
+    found, x, y = gesture.get_bounding_box_center()
+    self.zoom(self.view_at_start, scale, x if found else self.get_width() / 2)
+
+  def on_scroll(self, controller: Gtk.EventControllerScroll, dx: float, dy: float) -> bool:
+    if self.view is None:
+      return False
+    x = self.pointer_x if self.pointer_x is not None else self.get_width() / 2
+    self.zoom(self.view, scroll_zoom ** -dy, x)
+    return True
+
+  def on_motion(self, controller: Gtk.EventControllerMotion, x: float, y: float):
+    self.pointer_x = x
@@ -24,6 +24,11 @@ class DistanceRow(SpinRow):
     else:
       return value
 
+  def set_centimetres(self, value: float):
+    if self.imperial:
+      value = cm_to_in(value)
+    self.set_value(value)
+
   def get_inches(self):
     value = self.get_value()
     if self.imperial:
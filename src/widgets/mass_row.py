@@ -23,6 +23,11 @@ class MassRow(SpinRow):
     else:
       return self.get_value()
 
+  def set_kilograms(self, value: float):
+    if self.imperial:
+      value = kg_to_lb(value)
+    self.set_value(value)
+
   def get_pounds(self):
     if self.imperial:
       return self.get_value()
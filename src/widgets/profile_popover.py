@@ -0,0 +1,103 @@
+# Imports
+from gi.repository import GObject, Gtk, Pango
+
+# Internal imports
+from .shared import *
+
+# Picks, adds and removes named profiles. Takes a function that returns the
+# names matching a search, see ProfileStore.search(). Names are shown in a
+# ListView, which only creates rows for the visible ones, so thousands of
+# profiles cost no more than a few.
+@Gtk.Template(resource_path='/io/github/philippkosarev/bmi/widgets/profile_popover.ui')
+class ProfilePopover(Gtk.Popover):
+  __gtype_name__ = 'ProfilePopover'
+  __gsignals__ = {
+    # An empty name stands for using no profile
+    'profile-activated': (GObject.SignalFlags.RUN_LAST, None, (str,)),
+    'profile-added': (GObject.SignalFlags.RUN_LAST, None, (str,)),
+    'profile-removed': (GObject.SignalFlags.RUN_LAST, None, (str,)),
+  }
+
+  # Widgets
+  search_entry = Gtk.Template.Child()
+  list_view = Gtk.Template.Child()
+  empty_label = Gtk.Template.Child()
+  name_entry = Gtk.Template.Child()
+  add_button = Gtk.Template.Child()
+  leave_button = Gtk.Template.Child()
+
+  def __init__(self, search_function, **kwargs):
+    super().__init__(**kwargs)
+    self.search_function = search_function
+    self.active = ''
+    self.names = Gtk.StringList()
+    factory = Gtk.SignalListItemFactory()
+    factory.connect('setup', self.on_factory_setup)
+    factory.connect('bind', self.on_factory_bind)
+    self.list_view.set_factory(factory)
+    self.list_view.set_model(Gtk.NoSelection(model=self.names))
+    self.list_view.connect('activate', self.on_list_view_activate)
+    self.search_entry.connect('search-changed', self.on_search_changed)
+    self.search_entry.connect('activate', self.on_search_activate)
+    self.name_entry.connect('changed', self.on_name_changed)
+    self.name_entry.connect('activate', self.on_add)
+    self.add_button.connect('clicked', self.on_add)
+    self.leave_button.connect('clicked', self.on_leave_clicked)
+
+  # Marks the active profile, an empty name being none.
+  def set_active(self, name: str):
+    self.active = name
+    self.leave_button.set_visible(bool(name))
+
+  # Searches again, to show added and removed profiles.
+  def refresh(self):
+    names = self.search_function(self.search_entry.get_text())
+    self.names.splice(0, self.names.get_n_items(), names)
+    self.empty_label.set_visible(not names)
+
+  def on_factory_setup(self, factory: Gtk.SignalListItemFactory, list_item: Gtk.ListItem):
+    box = Gtk.Box(spacing=6)
+    label = Gtk.Label(xalign=0, hexpand=True, ellipsize=Pango.EllipsizeMode.END)
+    check = Gtk.Image(icon_name='object-select-symbolic')
+    remove_button = Gtk.Button(
+      icon_name='user-trash-symbolic', tooltip_text=_("Remove profile"),
+      css_classes=['flat'],
+    )
+    remove_button.connect('clicked', self.on_remove_clicked, list_item)
+    box.append(label)
+    box.append(check)
+    box.append(remove_button)
+    list_item.set_child(box)
+
+  def on_factory_bind(self, factory: Gtk.SignalListItemFactory, list_item: Gtk.ListItem):
+    name = list_item.get_item().get_string()
+    label = list_item.get_child().get_first_child()
+    label.set_label(name)
+    label.get_next_sibling().set_visible(name == self.active)
+
+  def on_list_view_activate(self, list_view: Gtk.ListView, position: int):
+    self.emit('profile-activated', self.names.get_string(position))
+
+  def on_search_changed(self, search_entry: Gtk.SearchEntry):
+    self.refresh()
+
+  # Enter switches to the best match
+  def on_search_activate(self, search_entry: Gtk.SearchEntry):
+    if self.names.get_n_items():
+      self.emit('profile-activated', self.names.get_string(0))
+
+  def on_name_changed(self, entry: Gtk.Entry):
+    self.add_button.set_sensitive(bool(entry.get_text().strip()))
+
+  def on_add(self, widget: Gtk.Widget):
+    name = self.name_entry.get_text().strip()
+    if not name:
+      return
+    self.name_entry.set_text('')
+    self.emit('profile-added', name)
+
+  def on_leave_clicked(self, button: Gtk.Button):
+    self.emit('profile-activated', '')
+
+  def on_remove_clicked(self, button: Gtk.Button, list_item: Gtk.ListItem):
+    self.emit('profile-removed', list_item.get_item().get_string())
@@ -1,9 +1,11 @@
 # Imports
-from gi.repository import GObject, Gtk, Adw
+from gi.repository import GObject, GLib, Gtk, Adw
 
 # Internal imports
 from .result_row import ResultRow
+from .chart import Chart, TrendChart, thresholds_to_bands
 from .shared import *
+from ..thresholds import as_threshold
 
 # Helper functions
 def stround(value: float) -> str:
@@ -30,6 +32,8 @@ class ThresholdRow(Adw.ActionRow):
     self.update_title()
 
   def set_units(self, units: str):
+    if units == self.units:
+      return
     self.units = units
     self.update_title()
 
@@ -48,41 +52,42 @@ class ThresholdRow(Adw.ActionRow):
       )
     self.set_title(title)
 
-def thresholds_to_rows(thresholds: list, units: str = '') -> list:
-  thresholds.sort(key=lambda x: x.get('value'))
+# Updates a pool of rows in place to show the thresholds, growing the pool
+# when there are more thresholds than rows, and hiding unused rows.
+# Takes Threshold records or threshold dicts.
+def thresholds_to_rows(
+  thresholds: list,
+  rows: list,
+  group: Adw.PreferencesGroup,
+  units: str = '',
+):
+  thresholds = sorted(map(as_threshold, thresholds), key=lambda x: x.value)
   n_thresholds = len(thresholds)
-  rows = []
+  while len(rows) < n_thresholds:
+    row = ThresholdRow()
+    group.add(row)
+    rows.append(row)
   for i in range(n_thresholds):
     curr_threshold = thresholds[i]
-    text = curr_threshold.get('text')
-    style = curr_threshold.get('style')
-    curr_value = curr_threshold.get('value')
+    text = curr_threshold.text
+    style = curr_threshold.style
+    curr_value = curr_threshold.value
     if i != 0:
-      prev_value = thresholds[i-1].get('value')
+      prev_value = thresholds[i-1].value
     else:
       prev_value = None
     if i < n_thresholds - 1:
-      next_value = thresholds[i+1].get('value')
+      next_value = thresholds[i+1].value
     else:
       next_value = None
-    row = ThresholdRow()
+    row = rows[i]
+    row.units = units
     row.set_values(prev_value, curr_value, next_value)
     row.set_style(style)
     row.set_subtitle(text)
-    row.set_units(units)
-    rows.append(row)
-  return rows
-
-# Internal functions
-def set_labels(self, result: float, thresholds: list):
-  for threshold in reversed(thresholds):
-    threshold_value = threshold.get('value')
-    if result >= threshold_value:
-      self.feedback_label.set_label(threshold.get('text'))
-      style = threshold.get('style')
-      set_style(self.result_label, style)
-      set_style(self.feedback_label, style)
-      break
+    row.set_visible(True)
+  for row in rows[n_thresholds:]:
+    row.set_visible(False)
 
 @Gtk.Template(resource_path='/io/github/philippkosarev/bmi/widgets/result_dialog.ui')
 class ResultDialog(Adw.Dialog):
@@ -92,35 +97,90 @@ class ResultDialog(Adw.Dialog):
   feedback_label = Gtk.Template.Child()
   thresholds_group = Gtk.Template.Child()
   context_group = Gtk.Template.Child()
+  sweep_group = Gtk.Template.Child()
+  sweep_chart = Gtk.Template.Child()
+  export_button = Gtk.Template.Child()
+  trend_group = Gtk.Template.Child()
+  trend_chart = Gtk.Template.Child()
 
   def __init__(self, result_row: ResultRow, **kwargs):
     super().__init__(**kwargs)
     title = result_row.get_title()
     self.set_title(title)
     self.digits = result_row.get_digits()
+    self.threshold_rows = []
+    self.context_rows = []
+    self.sweep_result = None
+    # The first and last times and the length of the shown history
+    self.trend_key = None
+    self.export_button.connect('clicked', self.on_export_clicked)
 
-  def set_result(self, result: float):
-    result = str(round(result, self.digits))
+  def set_result(self, result: float or None):
+    if result is None:
+      result = 'N/A'
+    else:
+      result = str(round(result, self.digits))
     self.result_label.set_label(result)
 
-  def set_feedback(self, result: float, thresholds: list):
-    thresholds.sort(key=lambda t: t.get('value'))
-    set_labels(self, result, thresholds)
-    rows = thresholds_to_rows(thresholds)
-    for row in rows:
-      self.thresholds_group.add(row)
+  # Takes a label from ThresholdTable.lookup() and the table's thresholds.
+  def set_feedback(self, text: str or None, style: int or None, thresholds: list):
+    self.feedback_label.set_label(text or '')
+    set_style(self.result_label, style)
+    set_style(self.feedback_label, style)
+    thresholds_to_rows(thresholds, self.threshold_rows, self.thresholds_group)
 
   def set_context(self, description: str, thresholds: list, imperial: bool):
     if imperial:
       units = _("lb")
-      for i in range(len(thresholds)):
-        threshold = thresholds[i]
-        value = threshold.get('value')
-        thresholds[i]['value'] = kg_to_lb(value)
+      thresholds = [
+        as_threshold(threshold).with_value(kg_to_lb(threshold.get('value')))
+        for threshold in thresholds
+      ]
     else:
       units = _("kg")
-    rows = thresholds_to_rows(thresholds, units)
-    for row in rows:
-      self.context_group.add(row)
+    thresholds_to_rows(thresholds, self.context_rows, self.context_group, units)
     self.context_group.set_description(description)
     self.context_group.set_visible(True)
+
+  # Shows a sweep.SweepResult as lines over its first axis, see Chart, with
+  # bands of the thresholds. The result is what gets exported, the x values
+  # and lines may be in other units.
+  def set_sweep(
+    self, description: str, result, x_values: list, lines: list, thresholds: list,
+    marker: float or None,
+  ):
+    self.sweep_result = result
+    self.sweep_chart.set_lines(x_values, lines)
+    self.sweep_chart.set_bands(thresholds_to_bands(thresholds))
+    self.sweep_chart.set_marker(marker)
+    self.sweep_group.set_description(description)
+    self.sweep_group.set_visible(True)
+
+  # Shows the result's history, see HistoryStore.query(), unless it has
+  # fewer than two results. The history is only downsampled again when it
+  # changed since it was last shown.
+  def set_trend(self, times, values, thresholds: list):
+    key = (times[0], times[-1], len(times)) if len(times) else None
+    if key != self.trend_key:
+      self.trend_chart.set_lines(times, [(values, None)])
+      self.trend_key = key
+    self.trend_chart.set_bands(thresholds_to_bands(thresholds))
+    self.trend_group.set_visible(self.trend_chart.get_n_points() >= 2)
+
+  def on_export_clicked(self, button: Gtk.Button):
+    file_dialog = Gtk.FileDialog(initial_name=self.sweep_result.get_metric() + '.csv')
+    file_dialog.save(self.get_root(), None, self.on_export_file_chosen)
+
+  def on_export_file_chosen(self, file_dialog: Gtk.FileDialog, result):
+    try:
+      file = file_dialog.save_finish(result)
+    except GLib.Error:
+      # Cancelled
+      return
+    try:
+      with open(file.get_path(), 'w', newline='') as csv_file:
+        self.sweep_result.to_csv(csv_file)
+    except OSError as e:
+      alert = Adw.AlertDialog(heading=_("Could not export"), body=str(e))
+      alert.add_response('close', _("Close"))
+      alert.present(self)
@@ -21,6 +21,11 @@ class ResultRow(Adw.ActionRow):
   def __init__(self, **kwargs):
     super().__init__(**kwargs)
     self.info_button.connect('clicked', self.on_info_button)
+    # What is currently shown, so unchanged values are not set again
+    self.shown_result = None
+    self.shown_subtitle = ''
+    self.shown_style = None
+    self.n_mutations = 0
 
   def on_info_button(self, button):
     self.emit('info-clicked', button)
@@ -30,24 +35,32 @@ class ResultRow(Adw.ActionRow):
       result = 'N/A'
     else:
       result = str(round(result, self.digits))
+    if result == self.shown_result:
+      return
+    self.shown_result = result
     self.label.set_label(result)
+    self.n_mutations += 1
 
   def get_result(self) -> str:
     return self.label.get_label()
 
-  def set_feedback(self, result: float, thresholds: list):
-    if result is None:
-      set_style(self, None)
-      self.set_subtitle('')
-      return
-    thresholds.sort(key=lambda t: t.get('value'))
-    thresholds.reverse()
-    for threshold in thresholds:
-      threshold_value = threshold.get('value')
-      if result >= threshold_value:
-        self.set_subtitle(threshold.get('text'))
-        set_style(self, threshold.get('style'))
-        break
+  # Takes a label from ThresholdTable.lookup(), text None clears the feedback.
+  def set_feedback(self, text: str or None, style: int or None):
+    if text is None:
+      text = ''
+      style = None
+    if text != self.shown_subtitle:
+      self.shown_subtitle = text
+      self.set_subtitle(text)
+      self.n_mutations += 1
+    if style != self.shown_style:
+      self.shown_style = style
+      set_style(self, style)
+      self.n_mutations += 1
+
+  # Returns how many times the shown result, subtitle or style changed.
+  def get_n_mutations(self) -> int:
+    return self.n_mutations
 
   def set_digits(self, digits: int):
     self.digits = digits
@@ -1,14 +1,11 @@
 # Imports
 from gi.repository import Gtk, Adw, Gio
-from enum import Enum
 
-# Variables:
+# Internal imports
+from ..calculator import Gender
+from ..units import kg_to_lb, lb_to_kg, in_to_cm, cm_to_in
 
-# Should always be in the same order as the StringList of gender_input_row.
-class Gender(Enum):
-  AVERAGE = 0
-  FEMALE = 1
-  MALE = 2
+# Variables:
 
 styles = [
   'light-blue',
@@ -56,21 +53,15 @@ def set_settings_value(settings: Gio.Settings, key: str, value):
   function = functions.get(type(value))
   return function(key, value)
 
-def set_style(widget: Gtk.Widget, style_index: int):
+# Only touches the classes that change, returns whether any did.
+def set_style(widget: Gtk.Widget, style_index: int) -> bool:
+  new_style = styles[style_index] if style_index is not None else None
+  changed = False
   for style in styles:
-    widget.remove_css_class(style)
-  if style_index is not None:
-    widget.add_css_class(styles[style_index])
-
-# Conversion functions
-def kg_to_lb(value: float) -> float:
-  return value * 2.2046226218
-
-def lb_to_kg(value: float) -> float:
-  return value * 1 / kg_to_lb(1)
-
-def in_to_cm(value):
-  return value * 2.54
-
-def cm_to_in(value):
-  return value * (1 / in_to_cm(1))
+    if style != new_style and widget.has_css_class(style):
+      widget.remove_css_class(style)
+      changed = True
+  if new_style is not None and not widget.has_css_class(new_style):
+    widget.add_css_class(new_style)
+    changed = True
+  return changed
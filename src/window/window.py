@@ -19,16 +19,18 @@
 # SPDX-License-Identifier: GPL-2.0-or-later
 
 # Imports
-from gi.repository import Gtk, Adw, Gio, Gdk
-import math, re, copy
+from gi.repository import GLib, Gtk, Adw, Gio, Gdk
+import math, time
 
 # Internal imports
-from . import widgets
-from .calculator import Calculator
+from . import widgets, metrics
+from .calculator import Inputs
+from .settings_writer import SettingsWriter
+from .history import HistoryStore
+from .profiles import ProfileStore
+from . import startup, timings, sweep, units
 
 # Shorthand vars
-calc = Calculator()
-clipboard = Gdk.Display.get_default().get_clipboard()
 horizontal = Gtk.Orientation.HORIZONTAL
 vertical = Gtk.Orientation.VERTICAL
 adw_lenght_units = {
@@ -37,27 +39,43 @@ adw_lenght_units = {
   'pt': Adw.LengthUnit.PT,
 }
 
-# Helper functions
-def eval_breakpoint(window, adw_breakpoint):
-  width = window.get_size(horizontal)
-  height = window.get_size(vertical)
-  condition = adw_breakpoint.get_condition().to_string()
-  condition = condition.replace('min-width:', 'width >')
-  condition = condition.replace('max-width:', 'width <')
-  condition = condition.replace('min-height:', 'height >')
-  condition = condition.replace('max-height:', 'height <')
-  condition = condition.split('and')
-  for statement in condition:
-    combined = re.search('([0-9]).*', statement).group().strip()
-    units = combined[-2] + combined[-1] # Last 2 chars (i.e. px, sp or pt)
-    value = float(combined.removesuffix(units))
-    units = adw_lenght_units.get(units)
-    pixels = math.ceil( Adw.LengthUnit.to_px(units, value) )
-    statement = statement.replace(combined, str(pixels))
-    if not eval(statement):
-      return False
-  return True
+# A breakpoint condition parsed once into comparisons against pixel sizes.
+# The pixel sizes depend on the text scale, so they are cached until
+# invalidate() is called.
+class BreakpointPredicate:
 
+  def __init__(self, adw_breakpoint: Adw.Breakpoint):
+    # Conditions look like "min-width: 580sp and max-height: 350sp"
+    condition = adw_breakpoint.get_condition().to_string()
+    self.clauses = []
+    for clause in condition.split(' and '):
+      name, value = clause.split(':')
+      kind, dimension = name.strip().split('-')
+      value = value.strip()
+      units = adw_lenght_units.get(value[-2:])
+      self.clauses.append((kind == 'min', dimension == 'width', float(value[:-2]), units))
+    self.bounds = None
+
+  def invalidate(self, *args):
+    self.bounds = None
+
+  def get_bounds(self) -> list:
+    if self.bounds is None:
+      self.bounds = [
+        (is_min, is_width, math.ceil(Adw.LengthUnit.to_px(units, value)))
+        for is_min, is_width, value, units in self.clauses
+      ]
+    return self.bounds
+
+  def evaluate(self, width: int, height: int) -> bool:
+    for is_min, is_width, pixels in self.get_bounds():
+      size = width if is_width else height
+      if is_min:
+        if not size > pixels:
+          return False
+      elif not size < pixels:
+        return False
+    return True
 
 @Gtk.Template(resource_path='/io/github/philippkosarev/bmi/window/window.ui')
 class BmiWindow(Adw.ApplicationWindow):
@@ -78,15 +96,28 @@ class BmiWindow(Adw.ApplicationWindow):
   waist_input_row = Gtk.Template.Child()
   hip_input_row = Gtk.Template.Child()
   ## Result rows
-  bmi_result_row = Gtk.Template.Child()
-  whtr_result_row = Gtk.Template.Child()
-  whr_result_row = Gtk.Template.Child()
-  bri_result_row = Gtk.Template.Child()
+  results_group = Gtk.Template.Child()
+  ## Profiles
+  window_title = Gtk.Template.Child()
+  profile_button = Gtk.Template.Child()
 
   def __init__(self, **kwargs):
     super().__init__(**kwargs)
+    startup.mark('template instantiation')
     self.get_app = self.get_application
     settings = self.get_app().get_settings()
+    self.input_writer = SettingsWriter(settings, settings['input-save-delay'])
+    self.input_writer.set_flush_callback(self.on_inputs_settled)
+    # Opened on first use
+    # Measurement histories by profile name, '' for the device's inputs
+    self.histories = {}
+    self.profiles = None
+    self.profile_popover = None
+    # The shown profile, None without one
+    self.active_profile = None
+    self.profile_save_id = None
+    # Set while input rows are changed without updating the results
+    self.setting_inputs = False
     # Configuring inputs
     self.input_rows = [
       self.height_input_row,
@@ -99,67 +130,44 @@ class BmiWindow(Adw.ApplicationWindow):
     for row in self.input_rows:
       key = row.get_key()
       row.set_value(settings[key])
-      row.connect(row.get_signal(), self.update_results)
-    # Configuring results
-    self.result_rows = [
-      self.bmi_result_row,
-      self.whtr_result_row,
-      self.whr_result_row,
-      self.bri_result_row,
-    ]
-    for row in self.result_rows:
+      row.connect(row.get_signal(), self.on_input_changed)
+    # Configuring results, a row per registered metric
+    self.metric_by_row = {}
+    for metric in metrics.registry.values():
+      row = widgets.ResultRow(title=metric.title, tooltip_text=metric.tooltip, digits=metric.digits)
       row.connect('activated', self.copy_result)
       row.connect('info-clicked', self.on_result_row_info_clicked)
-    self.result_row_info = {
-      self.bmi_result_row: {
-        'calc-function': calc.bmi,
-        'context': {
-          'calc-function': calc.bmi_and_height_to_weight,
-          'description': _("With the same height, this is what weight you need to get different BMI thresholds"),
-        },
-        'thresholds': [
-          {'text': _('Underweight [Severe]'),   'value': 0,    'style': 0},
-          {'text': _('Underweight [Moderate]'), 'value': 16,   'style': 0},
-          {'text': _('Underweight [Mild]'),     'value': 17,   'style': 0},
-          {'text': _('Healthy'),                'value': 18.5, 'style': 1},
-          {'text': _('Overweight'),             'value': 25,   'style': 2},
-          {'text': _('Obese [Class 1]'),        'value': 30,   'style': 3},
-          {'text': _('Obese [Class 2]'),        'value': 35,   'style': 3},
-          {'text': _('Obese [Class 3]'),        'value': 40,   'style': 3},
-        ],
-      },
-      self.whtr_result_row: {
-        'calc-function': calc.whtr,
-        'thresholds': [
-          {'text': _('Healthy'),   'value': 0,                   'style': 1},
-          {'text': _('Unhealthy'), 'value': calc.whtr_unhealthy, 'style': 2},
-        ],
-      },
-      self.whr_result_row: {
-        'calc-function': calc.whr,
-        'thresholds': [
-          {'text': _('Healthy'),    'value': 0,                   'style': 1},
-          {'text': _('Overweight'), 'value': calc.whr_overweight, 'style': 2},
-          {'text': _('Obese'),      'value': calc.whr_obese,      'style': 3},
-        ],
-      },
-      self.bri_result_row: {
-        'calc-function': calc.bri,
-        'thresholds': [
-          {'text': _('Very lean'),     'value': 0,    'style': 0},
-          {'text': _('Lean'),          'value': 3.41, 'style': 1},
-          {'text': _('Average'),       'value': 4.45, 'style': 1},
-          {'text': _('Above average'), 'value': 5.46, 'style': 2},
-          {'text': _('High'),          'value': 6.91, 'style': 3},
-        ],
-      },
+      self.results_group.add(row)
+      self.metric_by_row[row] = metric
+    self.result_rows = list(self.metric_by_row)
+    # Which inputs each result row depends on
+    self.row_inputs = {
+      row: metric.get_inputs() for row, metric in self.metric_by_row.items()
+    }
+    self.dirty_rows = set()
+    self.changed_keys = set()
+    self.update_tick_id = None
+    self.last_update_mutations = 0
+    self.result_dialogs = {}
+    # Parsing breakpoints
+    self.breakpoint_predicates = {
+      self.simple_breakpoint: BreakpointPredicate(self.simple_breakpoint),
+      self.advanced_breakpoint: BreakpointPredicate(self.advanced_breakpoint),
     }
+    gtk_settings = Gtk.Settings.get_default()
+    for predicate in self.breakpoint_predicates.values():
+      gtk_settings.connect('notify::gtk-xft-dpi', predicate.invalidate)
     # Setting stuff from settings
     window_width, window_height = settings['window-size']
     self.set_default_size(window_width, window_height)
     self.set_advanced_mode(settings['advanced-mode'])
+    self.set_record_timings(settings['record-timings'])
     self.set_imperial(settings['measurement-system'])
-    self.update_results()
+    active_profile = settings['active-profile']
+    if not active_profile or not self.switch_profile(active_profile):
+      self.update_results()
+    startup.mark('update_results')
+    self.profile_button.set_create_popup_func(self.on_profile_popup)
     # Connecting stuff
     settings.connect('changed', self.on_settings_changed)
     self.simple_breakpoint.connect('apply', self.on_simple_breakpoint_apply)
@@ -191,26 +199,31 @@ class BmiWindow(Adw.ApplicationWindow):
     else:
       self.orientable_box.set_spacing(16);
 
+  def eval_breakpoint(self, adw_breakpoint: Adw.Breakpoint) -> bool:
+    predicate = self.breakpoint_predicates.get(adw_breakpoint)
+    return predicate.evaluate(self.get_size(horizontal), self.get_size(vertical))
+
   def update_breakpoints(self):
-    if eval_breakpoint(self, self.advanced_breakpoint):
+    if self.eval_breakpoint(self.advanced_breakpoint):
       self.on_advanced_breakpoint_apply()
     else:
       self.on_advanced_breakpoint_unapply()
-    if eval_breakpoint(self, self.simple_breakpoint):
+    if self.eval_breakpoint(self.simple_breakpoint):
       self.on_simple_breakpoint_apply()
     else:
       self.on_simple_breakpoint_unapply()
 
   def set_advanced_mode(self, mode: bool):
     self.advanced_inputs_clamp.set_visible(mode)
-    self.whtr_result_row.set_visible(mode)
-    self.whr_result_row.set_visible(mode)
-    self.bri_result_row.set_visible(mode)
+    for row, metric in self.metric_by_row.items():
+      if metric.advanced:
+        row.set_visible(mode)
     self.update_breakpoints()
+    if self.dirty_rows:
+      self.update_rows(list(self.dirty_rows), self.get_inputs())
 
-  def get_inputs(self):
-    settings = self.get_app().get_settings()
-    inputs = {}
+  def get_inputs(self) -> Inputs:
+    inputs = Inputs()
     for row in self.input_rows:
       if hasattr(row, 'get_centimetres'):
         value = row.get_centimetres()
@@ -218,62 +231,387 @@ class BmiWindow(Adw.ApplicationWindow):
         value = row.get_kilograms()
       else:
         value = row.get_value()
-      key = row.get_key()
-      inputs[key] = value
-      if settings['remember-inputs']:
-        settings[key] = value
-      else:
-        settings.reset(key)
+      setattr(inputs, row.get_key(), value)
     return inputs
 
-  def calc_row_values(self, row: widgets.ResultRow, inputs: dict) -> tuple:
-    info = self.result_row_info.get(row)
-    calc_function = info.get('calc-function')
-    result = calc_function(inputs)
-    thresholds = copy.deepcopy(info.get('thresholds'))
-    for i in range(len(thresholds)):
-      threshold = thresholds[i]
-      value = threshold.get('value')
-      if callable(value):
-        thresholds[i]['value'] = value(inputs)
-    return result, thresholds
+  # Sets the input rows without updating the results, see get_inputs().
+  def set_inputs(self, inputs: Inputs):
+    self.setting_inputs = True
+    for row in self.input_rows:
+      value = getattr(inputs, row.get_key())
+      if value is None:
+        continue
+      if hasattr(row, 'set_centimetres'):
+        row.set_centimetres(value)
+      elif hasattr(row, 'set_kilograms'):
+        row.set_kilograms(value)
+      else:
+        row.set_value(value)
+    self.setting_inputs = False
 
-  def update_results(self, *args):
+  # Queues the inputs to be saved, or reset if they should not be remembered.
+  # Profiles keep their own inputs, which do not touch the settings.
+  def save_inputs(self, inputs: Inputs):
+    if self.active_profile is not None:
+      self.queue_profile_save()
+      return
+    remember = self.get_app().get_settings()['remember-inputs']
+    for key, value in inputs.items():
+      if remember:
+        self.input_writer.set(key, value)
+      else:
+        self.input_writer.reset(key)
+
+  # Returns the active profile's measurement history, or that of the
+  # device's inputs without one, opening it on first use.
+  def get_history(self) -> HistoryStore:
+    name = self.active_profile.name if self.active_profile else ''
+    history = self.histories.get(name)
+    if history is None:
+      directory = self.get_profiles().get_history_dir(name) if name else None
+      history = HistoryStore(directory)
+      self.histories[name] = history
+    return history
+
+  # Records the inputs in the history once they stopped changing.
+  def on_inputs_settled(self):
+    if not self.get_app().get_settings()['record-history']:
+      return
     inputs = self.get_inputs()
-    for row in self.result_row_info:
-      result, thresholds = self.calc_row_values(row, inputs)
-      row.set_result(result)
-      row.set_feedback(result, thresholds)
+    try:
+      history = self.get_history()
+      if not history.is_latest(inputs):
+        history.append(time.time(), inputs)
+    except (OSError, ValueError) as e:
+      print(f"Error recording history: {e}")
+
+  # Returns the row's result, and its threshold table updated for the inputs.
+  def calc_row_values(self, row: widgets.ResultRow, inputs: Inputs) -> tuple:
+    metric = self.metric_by_row.get(row)
+    result = metric.function(inputs)
+    table = metric.table
+    table.update(inputs)
+    return result, table
+
+  # Recomputes all results.
+  def update_results(self, *args):
+    # Covers any input changes queued for the next frame
+    self.changed_keys.clear()
+    with timings.stage('update_results'):
+      with timings.stage('update_results.get_inputs'):
+        inputs = self.get_inputs()
+      with timings.stage('update_results.save_inputs'):
+        self.save_inputs(inputs)
+      self.update_rows(self.metric_by_row, inputs)
+
+  # Queues the results that depend on the changed input to be recomputed on
+  # the next frame, before it is laid out, so any number of changes within a
+  # frame cost one update and the frame still shows the latest value.
+  def on_input_changed(self, input_row: Adw.ActionRow, param = None):
+    if self.setting_inputs:
+      return
+    self.changed_keys.add(input_row.get_key())
+    if self.update_tick_id is not None:
+      return
+    if not self.get_mapped():
+      # Tick callbacks only run while the window is shown
+      self.update_changed_inputs()
+      return
+    self.update_tick_id = self.add_tick_callback(self.on_update_tick)
+
+  def on_update_tick(self, widget: Gtk.Widget, frame_clock: Gdk.FrameClock) -> bool:
+    self.update_tick_id = None
+    self.update_changed_inputs()
+    return False
 
+  # Recomputes only the results that depend on the changed inputs.
+  def update_changed_inputs(self):
+    if self.update_tick_id is not None:
+      self.remove_tick_callback(self.update_tick_id)
+      self.update_tick_id = None
+    if not self.changed_keys:
+      return
+    with timings.stage('update_results'):
+      keys, self.changed_keys = self.changed_keys, set()
+      with timings.stage('update_results.get_inputs'):
+        inputs = self.get_inputs()
+      with timings.stage('update_results.save_inputs'):
+        self.save_inputs(inputs)
+      rows = [row for row, row_keys in self.row_inputs.items() if keys & row_keys]
+      self.update_rows(rows, inputs)
+
+  # Hidden rows are only marked dirty, and updated once they become visible.
+  def update_rows(self, rows: list, inputs: Inputs):
+    n_mutations = self.get_n_mutations()
+    for row in rows:
+      if not row.get_visible():
+        self.dirty_rows.add(row)
+        continue
+      self.dirty_rows.discard(row)
+      with timings.stage('update_results.calculate'):
+        result, table = self.calc_row_values(row, inputs)
+      with timings.stage('update_results.classify'):
+        text, style = table.lookup(result)
+      with timings.stage('update_results.set_result'):
+        row.set_result(result)
+      with timings.stage('update_results.set_feedback'):
+        row.set_feedback(text, style)
+    self.last_update_mutations = self.get_n_mutations() - n_mutations
+
+  # Returns how many widget changes the result rows have made in total.
+  def get_n_mutations(self) -> int:
+    return sum(row.get_n_mutations() for row in self.metric_by_row)
+
+  # Returns how many widget changes the last update of the results made.
+  def get_last_update_mutations(self) -> int:
+    return self.last_update_mutations
+
+  # Presents the row's dialog, which is created once and then refreshed.
   def on_result_row_info_clicked(self, row: widgets.ResultRow, button: Gtk.Button):
-    settings = self.get_app().get_settings()
-    dialog = widgets.ResultDialog(row)
-    inputs = self.get_inputs()
-    result, thresholds = self.calc_row_values(row, inputs)
-    dialog.set_result(result)
-    dialog.set_feedback(result, thresholds)
-    if 'context' in self.result_row_info.get(row):
-      description, thresholds = self.get_row_context(row)
-      dialog.set_context(description, thresholds, bool(settings['measurement-system']))
-    dialog.present(self)
+    with timings.stage('result_dialog'):
+      settings = self.get_app().get_settings()
+      dialog = self.result_dialogs.get(row)
+      if dialog is None:
+        with timings.stage('result_dialog.create'):
+          dialog = widgets.ResultDialog(row)
+        self.result_dialogs[row] = dialog
+      with timings.stage('result_dialog.calculate'):
+        inputs = self.get_inputs()
+        result, table = self.calc_row_values(row, inputs)
+        text, style = table.lookup(result)
+      with timings.stage('result_dialog.set_feedback'):
+        dialog.set_result(result)
+        dialog.set_feedback(text, style, table.to_list())
+      if self.metric_by_row.get(row).context is not None:
+        with timings.stage('result_dialog.set_context'):
+          description, thresholds = self.get_row_context(row, inputs)
+          dialog.set_context(description, thresholds, bool(settings['measurement-system']))
+      with timings.stage('result_dialog.set_sweep'):
+        self.set_row_sweep(dialog, row, inputs, table, bool(settings['measurement-system']))
+      with timings.stage('result_dialog.set_trend'):
+        self.set_row_trend(dialog, row, table)
+      with timings.stage('result_dialog.present'):
+        dialog.present(self)
 
-  def get_row_context(self, row: widgets.ResultRow) -> tuple:
-    settings = self.get_app().get_settings()
-    info = self.result_row_info.get(row)
-    thresholds = copy.deepcopy(info.get('thresholds'))
-    context_info = info.get('context')
+  def get_row_context(self, row: widgets.ResultRow, inputs: Inputs) -> tuple:
+    metric = self.metric_by_row.get(row)
+    thresholds = metric.table.to_list()
+    context_info = metric.context
     description = context_info.get('description')
     calc_function = context_info.get('calc-function')
-    inputs = self.get_inputs()
-    for i in range(len(thresholds)):
-      threshold = thresholds[i]
-      value = calc_function(inputs, threshold.get('value'))
-      thresholds[i]['value'] = value
+    table_function = context_info.get('table-function')
+    values = table_function(inputs) if table_function else None
+    if values is None:
+      values = [calc_function(inputs, threshold.value) for threshold in thresholds]
+    thresholds = [
+      threshold.with_value(value) for threshold, value in zip(thresholds, values)
+    ]
     return description, thresholds
 
+  # Shows how the row's result changes around the inputs, see sweep.what_if().
+  def set_row_sweep(
+    self, dialog, row: widgets.ResultRow, inputs: Inputs, table, imperial: bool,
+  ):
+    metric = self.metric_by_row.get(row)
+    sweep_info = metric.sweep
+    if sweep_info is None:
+      return
+    key = sweep_info.get('input')
+    try:
+      result = sweep.what_if(metric.name, inputs)
+    except ValueError as e:
+      print(f"Error sweeping {metric.name}: {e}")
+      return
+    x_values = result.get_axes()[0].values
+    marker = getattr(inputs, key)
+    lines = result.get_lines()
+    if result.get_metric() == 'target_weight':
+      # A line per BMI threshold, in its colour
+      lines = [(values, table.lookup(bmi)[1]) for (bmi,), values in lines]
+      thresholds = []
+      if imperial:
+        lines = [(units.convert_column(values, units.lb_per_kg), style) for values, style in lines]
+    else:
+      lines = [(values, None) for point, values in lines]
+      thresholds = table.to_list()
+    if imperial:
+      x_values = units.convert_column(x_values, units.in_per_cm)
+      marker = units.cm_to_in(marker)
+    dialog.set_sweep(sweep_info.get('description'), result, x_values, lines, thresholds, marker)
+
+  # Shows the row's result over the recorded history.
+  def set_row_trend(self, dialog, row: widgets.ResultRow, table):
+    metric = self.metric_by_row.get(row).name
+    try:
+      columns = self.get_history().query()
+    except (OSError, ValueError) as e:
+      print(f"Error reading history: {e}")
+      return
+    dialog.set_trend(columns.get('time'), columns.get(metric), table.to_list())
+
+  # Profiles
+
+  # Returns the profiles, loading them on first use.
+  def get_profiles(self) -> ProfileStore:
+    if self.profiles is None:
+      self.profiles = ProfileStore()
+    return self.profiles
+
+  def search_profiles(self, query: str) -> list:
+    try:
+      return self.get_profiles().search(query)
+    except (OSError, ValueError) as e:
+      print(f"Error loading profiles: {e}")
+      return []
+
+  # Returns the results of every metric, as profiles cache them.
+  def calc_profile_results(self, inputs: Inputs) -> dict:
+    results = {}
+    for row, metric in self.metric_by_row.items():
+      result, table = self.calc_row_values(row, inputs)
+      text, style = table.lookup(result)
+      results[metric.name] = (result, text, style)
+    return results
+
+  # Shows a profile's inputs and the results cached with them, calculating
+  # only those it has none of. An empty name goes back to the inputs of the
+  # settings. Returns False if there is no such profile.
+  def switch_profile(self, name: str) -> bool:
+    settings = self.get_app().get_settings()
+    profile = None
+    if name:
+      try:
+        profile = self.get_profiles().get(name)
+      except (OSError, ValueError) as e:
+        print(f"Error loading profiles: {e}")
+      if profile is None:
+        return False
+    # Pending changes belong to the profile that is left
+    self.update_changed_inputs()
+    self.flush_profile()
+    self.input_writer.flush()
+    self.active_profile = profile
+    if settings['active-profile'] != name:
+      settings['active-profile'] = name
+    self.window_title.set_subtitle(name)
+    if profile is None:
+      inputs = Inputs(**{row.get_key(): settings[row.get_key()] for row in self.input_rows})
+      results = {}
+    else:
+      inputs = profile.inputs
+      results = profile.results
+    self.set_inputs(inputs)
+    stale_rows = []
+    for row, metric in self.metric_by_row.items():
+      cached = results.get(metric.name)
+      if cached is None:
+        stale_rows.append(row)
+        continue
+      result, text, style = cached
+      row.set_result(result)
+      row.set_feedback(text, style)
+      self.dirty_rows.discard(row)
+    if stale_rows:
+      self.update_rows(stale_rows, self.get_inputs())
+    return True
+
+  # Saves the active profile once its inputs stop changing, like the
+  # SettingsWriter does for the settings.
+  def queue_profile_save(self):
+    if self.profile_save_id is not None:
+      GLib.source_remove(self.profile_save_id)
+    delay = self.get_app().get_settings()['input-save-delay']
+    self.profile_save_id = GLib.timeout_add(delay, self.on_profile_save_timeout)
+
+  def on_profile_save_timeout(self) -> bool:
+    self.profile_save_id = None
+    self.save_profile()
+    return GLib.SOURCE_REMOVE
+
+  # Saves a queued change of the active profile now.
+  def flush_profile(self):
+    if self.profile_save_id is None:
+      return
+    GLib.source_remove(self.profile_save_id)
+    self.profile_save_id = None
+    self.save_profile()
+
+  # Stores the inputs in the active profile, along with their results.
+  def save_profile(self):
+    profile = self.active_profile
+    if profile is None:
+      return
+    inputs = self.get_inputs()
+    try:
+      self.get_profiles().update(profile.name, inputs, self.calc_profile_results(inputs))
+      self.get_profiles().save()
+    except (OSError, ValueError) as e:
+      print(f"Error saving profiles: {e}")
+    self.on_inputs_settled()
+
+  def on_profile_popup(self, menu_button: Gtk.MenuButton):
+    if self.profile_popover is None:
+      popover = widgets.ProfilePopover(self.search_profiles)
+      popover.connect('profile-activated', self.on_profile_activated)
+      popover.connect('profile-added', self.on_profile_added)
+      popover.connect('profile-removed', self.on_profile_removed)
+      menu_button.set_popover(popover)
+      self.profile_popover = popover
+    name = self.active_profile.name if self.active_profile else ''
+    self.profile_popover.set_active(name)
+    self.profile_popover.refresh()
+
+  def on_profile_activated(self, popover, name: str):
+    popover.popdown()
+    with timings.stage('switch_profile'):
+      self.switch_profile(name)
+
+  # Adds a profile with the current inputs, and switches to it.
+  def on_profile_added(self, popover, name: str):
+    try:
+      profiles = self.get_profiles()
+      if profiles.get(name) is not None:
+        self.show_toast(_("There already is a profile named {}").format(name))
+        return
+      inputs = self.get_inputs()
+      profiles.add(name, inputs, self.calc_profile_results(inputs))
+      profiles.save()
+    except (OSError, ValueError) as e:
+      print(f"Error saving profiles: {e}")
+      return
+    popover.popdown()
+    self.switch_profile(name)
+
+  def on_profile_removed(self, popover, name: str):
+    dialog = Adw.AlertDialog(
+      heading=_("Remove {}?").format(name),
+      body=_("The profile's inputs and results are removed from this device."),
+    )
+    dialog.add_response('cancel', _("Cancel"))
+    dialog.add_response('remove', _("Remove"))
+    dialog.set_response_appearance('remove', Adw.ResponseAppearance.DESTRUCTIVE)
+    dialog.connect('response', self.on_remove_profile_response, name)
+    dialog.present(self)
+
+  def on_remove_profile_response(self, dialog: Adw.AlertDialog, response: str, name: str):
+    if response != 'remove':
+      return
+    if self.active_profile is not None and self.active_profile.name == name:
+      self.switch_profile('')
+    history = self.histories.pop(name, None)
+    if history is not None:
+      history.close()
+    try:
+      self.get_profiles().remove(name)
+      self.get_profiles().save()
+    except (OSError, ValueError, KeyError) as e:
+      print(f"Error removing profile: {e}")
+    if self.profile_popover is not None:
+      self.profile_popover.refresh()
+
   def copy_result(self, row: widgets.ResultRow):
     value = row.get_result()
-    Gdk.Clipboard.set(clipboard, value);
+    Gdk.Clipboard.set(self.get_clipboard(), value);
     self.show_toast(_("Result copied"))
 
   def show_toast(self, text):
@@ -283,9 +621,15 @@ class BmiWindow(Adw.ApplicationWindow):
 
   def set_imperial(self, measurement_system: int):
     imperial = bool(measurement_system)
-    for row in self.input_rows:
-      if hasattr(row, 'imperial'):
-        row.set_imperial(imperial)
+    with timings.stage('set_imperial'):
+      for row in self.input_rows:
+        if hasattr(row, 'imperial'):
+          with timings.stage('set_imperial.' + row.get_key()):
+            row.set_imperial(imperial)
+
+  def set_record_timings(self, record: bool):
+    timings.set_enabled(record)
+    timings.watch_frames(self)
 
   # Handles changes to settings.
   def on_settings_changed(self, settings: Gio.Settings, key: str):
@@ -293,6 +637,8 @@ class BmiWindow(Adw.ApplicationWindow):
       'advanced-mode': self.set_advanced_mode,
       'measurement-system': self.set_imperial,
       'remember-inputs': self.update_results,
+      'input-save-delay': self.input_writer.set_delay,
+      'record-timings': self.set_record_timings,
     }
     if key in update_functions:
       function = update_functions.get(key)
@@ -301,5 +647,10 @@ class BmiWindow(Adw.ApplicationWindow):
 
   # Action after closing the app window.
   def on_close_request(self, *args):
+    self.update_changed_inputs()
+    self.flush_profile()
+    self.input_writer.flush()
+    for history in self.histories.values():
+      history.close()
     settings = self.get_app().get_settings()
     settings['window-size'] = self.get_size(horizontal), self.get_size(vertical)
@@ -0,0 +1,18 @@
+# Makes the `bmi` package importable from the source tree. Only the modules
+# that do not need GTK can be tested this way.
+
+# Imports
+import sys, os, gettext, importlib.util
+
+# Variables
+source_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src')
+
+if 'bmi' not in sys.modules:
+  gettext.install('bmi')
+  spec = importlib.util.spec_from_file_location(
+    'bmi', os.path.join(source_dir, '__init__.py'),
+    submodule_search_locations=[source_dir],
+  )
+  package = importlib.util.module_from_spec(spec)
+  sys.modules['bmi'] = package
+  spec.loader.exec_module(package)
@@ -0,0 +1,123 @@
+# Calculator.batch() has to agree with the scalar functions, on both its
+# pure-Python and its NumPy path.
+
+# Imports
+import math, random
+import pytest
+
+# Internal imports
+from bmi.calculator import Calculator, Inputs, batch_python, batch_numpy
+
+# Shorthand vars
+calc = Calculator()
+
+# Variables
+batch_functions = ['bmi', 'whtr', 'whr', 'bri', 'whtr_unhealthy', 'whr_overweight', 'whr_obese']
+
+# Helper functions
+def random_rows(n: int, seed: int = 0) -> list:
+  generator = random.Random(seed)
+  return [
+    {
+      'height': generator.uniform(50, 250),
+      'mass': generator.uniform(10, 300),
+      'waist': generator.uniform(30, 200),
+      'hip': generator.uniform(50, 200),
+      'age': generator.choice([generator.randint(0, 150), generator.uniform(0, 150)]),
+      'gender': generator.randint(0, 2),
+    }
+    for i in range(n)
+  ]
+
+def to_columns(rows: list) -> dict:
+  return {key: [row[key] for row in rows] for key in rows[0]}
+
+# Returns the scalar function's result, NaN where it fails or returns None.
+def scalar(function: str, row: dict) -> float:
+  try:
+    result = getattr(calc, function)(Inputs(**row))
+  except (TypeError, ZeroDivisionError, ValueError):
+    return math.nan
+  return math.nan if result is None else result
+
+def assert_same(actual, expected):
+  assert len(actual) == len(expected)
+  for a, b in zip(actual, expected):
+    a, b = float(a), float(b)
+    if math.isnan(b):
+      assert math.isnan(a)
+    else:
+      assert a == pytest.approx(b, rel=1e-12, abs=1e-12)
+
+def assert_batches_match_scalars(batch, rows: list):
+  results = batch(to_columns(rows))
+  for function in batch_functions:
+    assert_same(results[function], [scalar(function, row) for row in rows])
+
+# Rows at the edges: zero divisors, waists too large for BRI's sqrt(), and
+# values whose squares overflow
+edge_rows = [
+  {'height': 1e200, 'mass': 70, 'waist': 80, 'hip': 95, 'age': 30, 'gender': 0},
+  {'height': 170, 'mass': 1e300, 'waist': 1e200, 'hip': 1e-200, 'age': 1e200, 'gender': 1},
+  {'height': 0, 'mass': 70, 'waist': 80, 'hip': 95, 'age': 30, 'gender': 0},
+  {'height': 170, 'mass': 70, 'waist': 80, 'hip': 0, 'age': 41, 'gender': 1},
+  {'height': 0, 'mass': 0, 'waist': 0, 'hip': 0, 'age': 0, 'gender': 2},
+  {'height': 50, 'mass': 70, 'waist': 200, 'hip': 95, 'age': 150, 'gender': 0},
+  {'height': 10, 'mass': 70, 'waist': 999, 'hip': 95, 'age': 80.5, 'gender': 1},
+]
+
+# Tests
+
+def test_python_matches_scalars():
+  assert_batches_match_scalars(batch_python, random_rows(2000))
+
+def test_python_edge_rows():
+  assert_batches_match_scalars(batch_python, edge_rows)
+
+def test_numpy_matches_scalars():
+  pytest.importorskip('numpy')
+  assert_batches_match_scalars(batch_numpy, random_rows(2000))
+
+def test_numpy_edge_rows():
+  pytest.importorskip('numpy')
+  assert_batches_match_scalars(batch_numpy, edge_rows)
+
+# Unset (None) and NaN inputs give NaN metrics on both paths, and the
+# thresholds of an unknown age are those of the scalar function of NaN.
+@pytest.mark.parametrize('missing', [None, math.nan])
+def test_missing_inputs(missing):
+  rows = random_rows(6, seed=1)
+  for row, key in zip(rows, ['height', 'mass', 'waist', 'hip', 'age']):
+    row[key] = missing
+  results = batch_python(to_columns(rows))
+  for function in ['bmi', 'whtr', 'whr', 'bri']:
+    expected = [
+      math.nan if any(row[key] is missing for key in getattr(calc, function).inputs)
+      else scalar(function, row)
+      for row in rows
+    ]
+    assert_same(results[function], expected)
+  assert_same(results['whtr_unhealthy'], [
+    calc.whtr_unhealthy(Inputs(age=math.nan if row['age'] is missing else row['age']))
+    for row in rows
+  ])
+  numpy = pytest.importorskip('numpy')
+  numpy_results = batch_numpy({
+    key: numpy.asarray(column, dtype=numpy.float64)
+    for key, column in to_columns(rows).items()
+  })
+  for function in batch_functions:
+    assert_same(numpy_results[function], results[function])
+
+def test_batch_dispatches_on_arrays():
+  numpy = pytest.importorskip('numpy')
+  rows = random_rows(50, seed=2)
+  columns = {key: numpy.asarray(column) for key, column in to_columns(rows).items()}
+  results = calc.batch(columns)
+  assert isinstance(results['bmi'], numpy.ndarray)
+  assert_same(results['bmi'], batch_python(to_columns(rows))['bmi'])
+
+def test_skip():
+  results = batch_python(to_columns(random_rows(10)), skip={'bmi', 'bri'})
+  assert 'bmi' not in results and 'bri' not in results
+  assert 'whtr' in results
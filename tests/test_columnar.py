@@ -0,0 +1,42 @@
+# Corrupt columnar files have to be rejected with ValueError, which the batch
+# scorer reports, not with a traceback.
+
+# Imports
+import pytest
+
+# Internal imports
+from bmi import columnar, scorer
+
+# Helper functions
+def write_file(path, n_rows: int = 3):
+  with columnar.ColumnarWriter(str(path), ['height', 'mass', 'gender']) as writer:
+    writer.append({'height': [170] * n_rows, 'mass': [70] * n_rows, 'gender': [1] * n_rows})
+
+# Tests
+
+def test_round_trip(tmp_path):
+  path = tmp_path / 'rows.bmic'
+  write_file(path)
+  with columnar.ColumnarReader(str(path)) as reader:
+    assert reader.get_n_rows() == 3
+    assert list(reader.get_columns().get('gender')) == [1, 1, 1]
+
+@pytest.mark.parametrize('type_code', [b'?', b'x', b'\xff', b'Z'])
+def test_unknown_type(tmp_path, type_code):
+  path = tmp_path / 'rows.bmic'
+  write_file(path)
+  data = bytearray(path.read_bytes())
+  # The type code of the first column
+  data[columnar.header_struct.size + 16:columnar.header_struct.size + 17] = type_code
+  path.write_bytes(bytes(data))
+  with pytest.raises(ValueError, match='unknown type'):
+    columnar.ColumnarReader(str(path))
+
+def test_truncated(tmp_path, capsys):
+  path = tmp_path / 'rows.bmic'
+  write_file(path)
+  path.write_bytes(path.read_bytes()[:columnar.header_struct.size + 4])
+  with pytest.raises(ValueError, match='truncated'):
+    columnar.ColumnarReader(str(path))
+  assert scorer.main([str(path), '-o', str(tmp_path / 'out.csv')]) == 1
+  assert 'truncated' in capsys.readouterr().err
@@ -0,0 +1,113 @@
+# The history has to keep every appended entry across compactions, reloads
+# and interrupted compactions, whatever order their times are in.
+
+# Imports
+import os, math, struct, pytest
+
+# Internal imports
+from bmi import history
+from bmi.calculator import Inputs
+
+# Variables
+inputs = Inputs(height=170, mass=70, waist=80, hip=95, age=30, gender=1)
+
+# Helper functions
+def get_times(store) -> list:
+  return list(store.query().get('time'))
+
+# Tests
+
+def test_append_and_reload(tmp_path):
+  store = history.HistoryStore(str(tmp_path))
+  for i in range(10):
+    store.append(float(i), inputs)
+  assert store.get_n_entries() == 10
+  store.close()
+  store = history.HistoryStore(str(tmp_path))
+  assert get_times(store) == [float(i) for i in range(10)]
+  assert store.is_latest(inputs)
+  columns = store.query(2, 4)
+  assert list(columns.get('time')) == [2.0, 3.0, 4.0]
+  assert columns.get('bmi')[0] == pytest.approx(70 / 1.7 ** 2)
+  store.close()
+
+def test_compact_and_reload(tmp_path):
+  store = history.HistoryStore(str(tmp_path))
+  n_entries = history.compact_threshold + 10
+  for i in range(n_entries):
+    store.append(float(i), inputs)
+  assert store.get_n_compacted() == history.compact_threshold
+  assert len(store.log) == 10
+  store.close()
+  store = history.HistoryStore(str(tmp_path))
+  assert get_times(store) == [float(i) for i in range(n_entries)]
+  store.close()
+
+def test_out_of_order_times(tmp_path):
+  store = history.HistoryStore(str(tmp_path))
+  for i in range(history.compact_threshold):
+    store.append(100.0 + i, inputs)
+  # Written after a step back of the clock, before the compacted entries
+  store.append(5.0, inputs)
+  store.append(150.0, inputs)
+  n_entries = store.get_n_entries()
+  store.close()
+  store = history.HistoryStore(str(tmp_path))
+  assert store.get_n_entries() == n_entries
+  times = get_times(store)
+  assert times == sorted(times)
+  assert times[0] == 5.0 and times.count(150.0) == 2
+  store.close()
+
+def test_interrupted_compaction(tmp_path, monkeypatch):
+  store = history.HistoryStore(str(tmp_path))
+  for i in range(history.compact_threshold - 1):
+    store.append(float(i), inputs)
+  store.close()
+  store = history.HistoryStore(str(tmp_path))
+  # Stops after the compacted file was replaced, before the log is emptied
+  monkeypatch.setattr(store, 'rewrite_log', lambda: None)
+  store.append(1000.0, inputs)
+  store.log_file.close()
+  store.log_file = None
+  store.reader.close()
+  store.reader = None
+  monkeypatch.undo()
+  store = history.HistoryStore(str(tmp_path))
+  assert store.get_n_entries() == history.compact_threshold
+  assert get_times(store)[-1] == 1000.0
+  store.close()
+
+def test_partial_record(tmp_path):
+  store = history.HistoryStore(str(tmp_path))
+  store.append(1.0, inputs)
+  store.append(2.0, inputs)
+  store.close()
+  with open(os.path.join(tmp_path, history.log_name), 'ab') as file:
+    file.write(b'\0' * 5)
+  store = history.HistoryStore(str(tmp_path))
+  assert get_times(store) == [1.0, 2.0]
+  store.append(3.0, inputs)
+  store.close()
+  store = history.HistoryStore(str(tmp_path))
+  assert get_times(store) == [1.0, 2.0, 3.0]
+  store.close()
+
+def test_log_of_other_keys(tmp_path):
+  # A log written before a metric was registered, and with one since removed
+  keys = history.history_keys[:-1] + ('old',)
+  record = struct.Struct('<' + 'd' * len(keys))
+  with open(os.path.join(tmp_path, history.log_name), 'wb') as file:
+    file.write(history.pack_log_header(keys, 0))
+    file.write(record.pack(*range(len(keys))))
+  store = history.HistoryStore(str(tmp_path))
+  latest = store.get_latest()
+  assert latest[:-1] == tuple(map(float, range(len(keys) - 1)))
+  assert math.isnan(latest[-1])
+  store.close()
+
+def test_not_a_log(tmp_path):
+  with open(os.path.join(tmp_path, history.log_name), 'wb') as file:
+    file.write(b'\0' * 100)
+  with pytest.raises(ValueError):
+    history.HistoryStore(str(tmp_path))
@@ -0,0 +1,57 @@
+# Result rows only touch their widgets when what they show changes, which
+# their mutation counter makes visible. Needs GTK, a display and a built
+# bmi.gresource, from BMI_PKGDATADIR or the default user install.
+
+# Imports
+import os, pytest
+
+# Variables
+pkgdatadir = os.environ.get('BMI_PKGDATADIR') or os.path.expanduser('~/.local/share/bmi')
+resource_path = os.path.join(pkgdatadir, 'bmi.gresource')
+
+@pytest.fixture(scope='module')
+def result_row_class():
+  gi = pytest.importorskip('gi')
+  try:
+    gi.require_version('Gtk', '4.0')
+    gi.require_version('Adw', '1')
+  except ValueError as e:
+    pytest.skip(str(e))
+  from gi.repository import Gio, Gtk, Adw
+  if not os.path.exists(resource_path):
+    pytest.skip(f'{resource_path} is not built')
+  if not Gtk.init_check():
+    pytest.skip('No display')
+  Gio.Resource.load(resource_path)._register()
+  Adw.init()
+  from bmi.widgets import ResultRow
+  return ResultRow
+
+# Tests
+
+def test_same_result_makes_no_mutations(result_row_class):
+  row = result_row_class()
+  row.set_digits(1)
+  row.set_result(24.21)
+  row.set_feedback('Healthy', 1)
+  # The result, the subtitle and the style
+  assert row.get_n_mutations() == 3
+  row.set_result(24.21)
+  row.set_feedback('Healthy', 1)
+  assert row.get_n_mutations() == 3
+  # Shown rounded like before
+  row.set_result(24.24)
+  assert row.get_n_mutations() == 3
+
+def test_changes_are_counted(result_row_class):
+  row = result_row_class()
+  row.set_digits(1)
+  row.set_result(24.2)
+  row.set_feedback('Healthy', 1)
+  n_mutations = row.get_n_mutations()
+  row.set_result(26.0)
+  row.set_feedback('Overweight', 2)
+  assert row.get_n_mutations() == n_mutations + 3
+  row.set_feedback(None, None)
+  assert row.get_n_mutations() == n_mutations + 5
+  assert row.get_subtitle() == ''
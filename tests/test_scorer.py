@@ -0,0 +1,96 @@
+# Malformed rows have to end batch scoring with an error naming their line.
+
+# Imports
+import io, json, pytest
+
+# Internal imports
+from bmi import scorer
+
+# Variables
+good_row = {'height': 170, 'mass': 70, 'waist': 80, 'hip': 95, 'age': 30, 'gender': 1}
+
+# Helper functions
+def to_jsonl(rows: list) -> str:
+  return ''.join(json.dumps(row) + '\n' for row in rows)
+
+# Tests
+
+@pytest.mark.parametrize('value', [None, 'tall', [170], {'cm': 170}, True])
+def test_parse_value_rejects_non_numbers(value):
+  with pytest.raises(ValueError, match="'height'"):
+    scorer.parse_value('height', value)
+
+def test_parse_value_accepts_numbers():
+  assert scorer.parse_value('height', '170.5') == 170.5
+  assert scorer.parse_value('age', 30.7) == 30
+
+@pytest.mark.parametrize('row', [[170, 70], 'height', 5, None])
+def test_parse_row_rejects_non_objects(row):
+  with pytest.raises(ValueError):
+    scorer.parse_row(row)
+  with pytest.raises(scorer.RowError, match='^Line 3: '):
+    scorer.parse_row(row, 3)
+
+@pytest.mark.parametrize('bad_line', [
+  json.dumps(good_row | {'height': None}),
+  json.dumps([170, 70]),
+  json.dumps(good_row | {'gender': 7}),
+  '{"height": ',
+])
+def test_jsonl_errors_name_the_line(bad_line):
+  text = to_jsonl([good_row]) + '\n' + bad_line + '\n' + to_jsonl([good_row])
+  with pytest.raises(scorer.RowError) as error:
+    scorer.score_jsonl(io.StringIO(text), io.StringIO())
+  # The blank line still counts
+  assert error.value.line == 3
+
+def test_main_reports_bad_rows(tmp_path, capsys):
+  path = tmp_path / 'rows.jsonl'
+  path.write_text(to_jsonl([good_row, good_row | {'mass': None}]))
+  assert scorer.main([str(path), '-o', str(tmp_path / 'out.jsonl')]) == 1
+  assert 'Line 2:' in capsys.readouterr().err
+
+def test_parallel_errors_name_the_line(tmp_path, capsys):
+  rows = [good_row] * 5000
+  rows[4321] = good_row | {'waist': 'wide'}
+  path = tmp_path / 'rows.jsonl'
+  path.write_text(to_jsonl(rows))
+  assert scorer.main([str(path), '-o', str(tmp_path / 'out.jsonl'), '-j', '4']) == 1
+  assert 'Line 4322:' in capsys.readouterr().err
+
+def test_metric_selection_is_per_run(tmp_path):
+  path = tmp_path / 'rows.csv'
+  path.write_text('height,mass,waist,hip,age,gender\n170,70,80,95,30,1\n')
+  output = tmp_path / 'out.csv'
+  assert scorer.main([str(path), '-o', str(output), '-m', 'bri,bmi']) == 0
+  assert output.read_text().splitlines()[0].endswith('bmi,bmi_category,bri,bri_category')
+  assert scorer.main([str(path), '-o', str(output)]) == 0
+  assert 'whtr_category' in output.read_text().splitlines()[0]
+
+@pytest.mark.parametrize('bad_row', ['170,tall,80,95,30,1', '170,70,80', '170,70,80,95,30,7'])
+def test_csv_errors_name_the_line(bad_row):
+  text = 'height,mass,waist,hip,age,gender\n170,70,80,95,30,1\n' + bad_row + '\n'
+  with pytest.raises(scorer.RowError) as error:
+    scorer.score_csv(io.StringIO(text), io.StringIO())
+  assert error.value.line == 3
+
+def test_parallel_csv_errors_name_the_line(tmp_path, capsys):
+  lines = ['height,mass,waist,hip,age,gender'] + ['170,70,80,95,30,1'] * 5000
+  lines[4321] = '170,70,wide,95,30,1'
+  path = tmp_path / 'rows.csv'
+  path.write_text('\n'.join(lines) + '\n')
+  assert scorer.main([str(path), '-o', str(tmp_path / 'out.csv'), '-j', '4']) == 1
+  assert 'Line 4322:' in capsys.readouterr().err
+
+# Squares of huge values overflow, which has to give results, not a traceback
+@pytest.mark.parametrize('suffix', ['.csv', '.jsonl'])
+def test_huge_values(tmp_path, suffix):
+  path = tmp_path / ('rows' + suffix)
+  row = good_row | {'height': 1e200, 'waist': 1e300}
+  if suffix == '.csv':
+    path.write_text(','.join(row) + '\n' + ','.join(map(str, row.values())) + '\n')
+  else:
+    path.write_text(to_jsonl([row]))
+  output = tmp_path / ('out' + suffix)
+  assert scorer.main([str(path), '-o', str(output)]) == 0
+  assert '1e+200' in output.read_text()